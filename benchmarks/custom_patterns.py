@@ -0,0 +1,86 @@
+"""
+Microbenchmark of custom pattern recognizers: one regex per recognizer vs
+CombinedPatternRecognizer, for a growing number of patterns.
+
+    python benchmarks/custom_patterns.py --counts 2 10 50 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from presidio_analyzer import Pattern, PatternRecognizer  # noqa: E402
+
+from combined_pattern_recognizer import CombinedPatternRecognizer  # noqa: E402
+
+
+def make_recognizers(count):
+    return [
+        PatternRecognizer(
+            supported_entity=f"CUSTOM_{i}",
+            name=f"Custom {i} Recognizer",
+            patterns=[Pattern(f"Custom {i} Pattern", rf"\bC{i:03d}-\d{{5}}\b", 0.8)],
+            context=[f"custom{i}"],
+        )
+        for i in range(count)
+    ]
+
+
+def make_corpus(count, size, seed=0):
+    rng = random.Random(seed)
+    words = "firewall rule allows tcp from the dmz to core switch owner".split()
+    texts = []
+    for _ in range(size):
+        tokens = rng.choices(words, k=30)
+        tokens.insert(rng.randrange(len(tokens)), f"C{rng.randrange(count):03d}-12345")
+        texts.append(" ".join(tokens))
+    return texts
+
+
+def time_recognizers(recognizers, texts, repeat):
+    start = time.perf_counter()
+    found = 0
+    for _ in range(repeat):
+        for text in texts:
+            for recognizer in recognizers:
+                found += len(recognizer.analyze(text, entities=[]))
+    return (time.perf_counter() - start) / repeat, found // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--counts", type=int, nargs="+", default=[2, 10, 50, 100, 200])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.texts} texts per run, mean of {args.repeat} runs")
+    print(
+        f"{'patterns':>9}{'separate ms':>14}{'combined ms':>14}{'speedup':>10}{'matches':>10}"
+    )
+    for count in args.counts:
+        texts = make_corpus(count, args.texts)
+        separate = make_recognizers(count)
+        combined = [CombinedPatternRecognizer(make_recognizers(count))]
+
+        separate_seconds, separate_found = time_recognizers(
+            separate, texts, args.repeat
+        )
+        combined_seconds, combined_found = time_recognizers(
+            combined, texts, args.repeat
+        )
+        if separate_found != combined_found:
+            print(f"  warning: {separate_found} vs {combined_found} matches")
+
+        print(
+            f"{count:>9}{separate_seconds * 1000:>14.1f}{combined_seconds * 1000:>14.1f}"
+            f"{separate_seconds / combined_seconds:>10.1f}x{combined_found:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Latency and redaction recall of image redaction across OCR downscaling
+settings, on synthetic screenshots with known PII positions.
+
+A PII string counts as redacted when at least --coverage of its ink pixels
+are under the redaction fill on the full-size output. --max-edges 0 is the
+unscaled baseline (the app with PII_OCR_PREPROCESS off).
+
+    python benchmarks/ocr_scaling.py --size 3840x2160 --max-edges 0 3000 2000 1500 1000
+    python benchmarks/ocr_scaling.py --binarize
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from ocr_preprocessing import OcrPreprocessor, redact_image  # noqa: E402
+
+FILL = (255, 0, 0)
+
+PII = [
+    "John Smith",
+    "maria.garcia@example.com",
+    "212-555-0143",
+    "Priya Patel",
+    "wei.chen@example.org",
+    "+44 20 7946 0958",
+]
+FILLER = [
+    "Firewall rule 1042 allows TCP 443 from the DMZ",
+    "Patch level: Windows Server 2019 build 17763",
+    "VPN gateway uptime 99.98% over the last quarter",
+    "Change request approved for core switch upgrade",
+]
+
+
+def make_screenshot(size, font_size, seed):
+    # Returns the image and the text boxes of every PII string drawn on it
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=font_size)
+
+    boxes = []
+    y = font_size
+    while y < size[1] - 2 * font_size:
+        x = font_size
+        line = rng.choice(FILLER)
+        draw.text((x, y), line, fill=(30, 30, 30), font=font)
+        x += draw.textlength(line + "  ", font=font)
+        pii = rng.choice(PII)
+        label = "Contact: "
+        draw.text((x, y), label, fill=(30, 30, 30), font=font)
+        x += draw.textlength(label, font=font)
+        if x + draw.textlength(pii, font=font) < size[0]:
+            draw.text((x, y), pii, fill=(30, 30, 30), font=font)
+            boxes.append(draw.textbbox((x, y), pii, font=font))
+        y += int(font_size * 2.2)
+    return image, boxes
+
+
+def is_redacted(original, redacted, box, coverage):
+    # Whether enough of the ink pixels inside box ended up under the fill
+    region = original.crop(box).convert("L")
+    out = redacted.crop(box).convert("RGB")
+    ink = covered = 0
+    for value, pixel in zip(region.getdata(), out.getdata()):
+        if value < 128:
+            ink += 1
+            covered += pixel == FILL
+    return ink == 0 or covered / ink >= coverage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="3840x2160")
+    parser.add_argument("--font-size", type=int, default=28)
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument(
+        "--max-edges", type=int, nargs="+", default=[0, 3000, 2000, 1500, 1000]
+    )
+    parser.add_argument("--no-grayscale", action="store_true")
+    parser.add_argument("--binarize", action="store_true")
+    parser.add_argument("--coverage", type=float, default=0.95)
+    args = parser.parse_args()
+
+    from presidio_analyzer import AnalyzerEngine
+    from presidio_image_redactor import ImageAnalyzerEngine, ImageRedactorEngine
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    screenshots = [
+        make_screenshot(size, args.font_size, seed) for seed in range(args.images)
+    ]
+    analyzer = AnalyzerEngine()
+    analyzer.analyze("warm up", language="en")
+
+    print(f"{'max edge':>9} {'scale':>6} {'mean s':>8} {'p95 s':>7} {'recall':>7}")
+    for max_edge in args.max_edges:
+        preprocessor = OcrPreprocessor(
+            target_dpi=0,
+            max_edge=max_edge,
+            grayscale=not args.no_grayscale,
+            binarize=args.binarize,
+        )
+        redactor = ImageRedactorEngine(
+            ImageAnalyzerEngine(
+                analyzer_engine=analyzer, image_preprocessor=preprocessor
+            )
+        )
+
+        seconds, found, total = [], 0, 0
+        for image, boxes in screenshots:
+            start = time.perf_counter()
+            redacted = redact_image(redactor, image, fill=FILL)
+            seconds.append(time.perf_counter() - start)
+            found += sum(
+                is_redacted(image, redacted, box, args.coverage) for box in boxes
+            )
+            total += len(boxes)
+
+        scale = preprocessor.scale_for(screenshots[0][0])
+        p95 = sorted(seconds)[min(len(seconds) - 1, int(0.95 * len(seconds)))]
+        print(
+            f"{max_edge or 'full':>9} {scale:>6.2f} {statistics.mean(seconds):>8.2f} "
+            f"{p95:>7.2f} {found / max(total, 1):>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
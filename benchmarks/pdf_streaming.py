@@ -0,0 +1,181 @@
+"""
+Peak RSS and time of the PDF pipeline on synthetic PDFs of increasing page
+count, streamed page by page vs extracted up front (PII_PDF_STREAMING off).
+Every run is a fresh process against the mock LLM server; with streaming the
+peak should stay about flat apart from the uploaded file itself.
+
+    python benchmarks/pdf_streaming.py --pages 50 200 900
+    python benchmarks/pdf_streaming.py --pages 100 400 --image-size 0
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+import zlib
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+sys.path.insert(0, SRC_DIR)
+
+from mock_llm_server import start_in_background  # noqa: E402
+
+LINES = [
+    "Audit finding {n}: firewall rule 1042 allows TCP 443 from the DMZ.",
+    "Reviewed by {name}, contact {email} or call 212-555-{phone:04d}.",
+    "Patch level: Windows Server 2019 build 17763, last reboot 14 days ago.",
+    "VPN gateway uptime 99.98% over the last quarter.",
+    "Change request approved by {name} for the core switch upgrade.",
+]
+NAMES = ["John Smith", "Maria Garcia", "Wei Chen", "Priya Patel"]
+
+
+class UploadedFile(io.BytesIO):
+    # The parts of Streamlit's UploadedFile the pipeline uses
+    def __init__(self, data, name, type):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages, image_size, seed=0):
+    # A minimal PDF: per page ~40 lines of text and, if image_size, one
+    # image_size x image_size RGB image of noise (it does not compress, so
+    # holding decoded images shows up in RSS)
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+
+    for number in range(pages):
+        lines = [
+            rng.choice(LINES).format(
+                n=number,
+                name=rng.choice(NAMES),
+                email=f"user{rng.randrange(50)}@example.com",
+                phone=rng.randrange(10000),
+            )
+            for _ in range(40)
+        ]
+        content = "BT /F1 10 Tf 14 TL 50 780 Td "
+        content += " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        resources = b"/Font << /F1 3 0 R >>"
+        if image_size:
+            content += f" q {image_size} 0 0 {image_size} 50 50 cm /Im0 Do Q"
+            data = zlib.compress(rng.randbytes(image_size * image_size * 3))
+            objects.append(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                b"/ColorSpace /DeviceRGB /BitsPerComponent 8 "
+                b"/Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream"
+                % (image_size, image_size, len(data), data)
+            )
+            resources += b" /XObject << /Im0 %d 0 R >>" % len(objects)
+
+        content = content.encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << %s >> /Contents %d 0 R >>" % (resources, len(objects))
+        )
+        page_ids.append(len(objects))
+
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids),
+        pages,
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+def _run(data, streaming, queue):
+    sys.path.insert(0, SRC_DIR)
+    os.environ["PII_PDF_STREAMING"] = "true" if streaming else "false"
+    try:
+        from pii_remover import analyzer_engine
+        from pipeline import get_set_go
+
+        analyzer_engine().analyze("warm up", language="en")
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        start = time.perf_counter()
+        result = get_set_go(UploadedFile(data, "report.pdf", "application/pdf"))
+        queue.put(
+            {
+                "seconds": time.perf_counter() - start,
+                "baseline_mb": baseline,
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                / 1024,
+                "ok": "error" not in result,
+            }
+        )
+    except Exception as e:
+        queue.put({"error": str(e)})
+
+
+def run(data, streaming):
+    # A fresh process per run so peak RSS is not shared between runs
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(data, streaming, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 900])
+    parser.add_argument("--image-size", type=int, default=160)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    server = start_in_background(latency_ms=args.latency_ms, jitter_ms=0, seed=0)
+    os.environ["PII_ANALYSIS_BACKEND"] = "http"
+    os.environ["PII_ANALYSIS_BACKEND_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["PII_CACHE_ENABLED"] = "false"
+
+    print(
+        f"{'pages':>6} {'file MB':>8} {'mode':>10} {'seconds':>8} "
+        f"{'peak RSS MB':>12} {'over warm MB':>13} {'ok':>4}"
+    )
+    for pages in args.pages:
+        data = make_pdf(pages, args.image_size)
+        for streaming in (True, False):
+            result = run(data, streaming)
+            mode = "streaming" if streaming else "eager"
+            if "error" in result:
+                print(f"{pages:>6} {len(data) / 2**20:>8.1f} {mode:>10} {result}")
+                continue
+            print(
+                f"{pages:>6} {len(data) / 2**20:>8.1f} {mode:>10} "
+                f"{result['seconds']:>8.1f} {result['peak_rss_mb']:>12.0f} "
+                f"{result['peak_rss_mb'] - result['baseline_mb']:>13.0f} "
+                f"{str(result['ok']):>4}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Offline load test of the whole pipeline: starts the mock LLM server, points
+the pipeline at it (PII_ANALYSIS_BACKEND=http) and pushes synthetic xlsx,
+pptx and png files through get_set_go from several threads, then reports
+throughput and per-file latency percentiles.
+
+    python benchmarks/pipeline_load.py --files 40 --workers 4 --latency-ms 300 --error-rate 0.05
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from mock_llm_server import start_in_background  # noqa: E402
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PPTX = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+NAMES = ["John Smith", "Maria Garcia", "Wei Chen", "Priya Patel", "Tom Baker"]
+
+
+class UploadedFile(io.BytesIO):
+    # The parts of Streamlit's UploadedFile the pipeline uses
+    def __init__(self, data, name, type):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+
+
+def make_png(rng):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (640, 360), "white")
+    draw = ImageDraw.Draw(image)
+    draw.text((20, 20), f"Server room access: {rng.choice(NAMES)}", fill="black")
+    draw.text((20, 60), f"Call 212-555-{rng.randrange(10000):04d}", fill="black")
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_xlsx(rng, rows=200):
+    import pandas as pd
+
+    df = pd.DataFrame(
+        {
+            "owner": [rng.choice(NAMES) for _ in range(rows)],
+            "email": [f"user{rng.randrange(1000)}@example.com" for _ in range(rows)],
+            "host": [f"srv-{rng.randrange(50):02d}" for _ in range(rows)],
+            "port": [rng.choice([22, 80, 443, 3389]) for _ in range(rows)],
+        }
+    )
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def make_pptx(rng, images=3):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+    slide.shapes.title.text = f"Firewall review by {rng.choice(NAMES)}"
+    for i in range(images):
+        slide.shapes.add_picture(
+            io.BytesIO(make_png(rng)), Inches(1 + 3 * i), Inches(2), Inches(2.5)
+        )
+    buf = io.BytesIO()
+    presentation.save(buf)
+    return buf.getvalue()
+
+
+def make_files(count, seed=0):
+    rng = random.Random(seed)
+    makers = [
+        ("png", "image/png", make_png),
+        ("xlsx", XLSX, make_xlsx),
+        ("pptx", PPTX, make_pptx),
+    ]
+    files = []
+    for i in range(count):
+        extension, file_type, make = makers[i % len(makers)]
+        files.append((f"load_{i}.{extension}", file_type, make(rng)))
+    return files
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--tail-rate", type=float, default=0.02)
+    parser.add_argument("--tail-ms", type=float, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_in_background(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        error_rate=args.error_rate,
+        seed=0,
+    )
+    os.environ["PII_ANALYSIS_BACKEND"] = "http"
+    os.environ["PII_ANALYSIS_BACKEND_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["PII_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("PII_GEMINI_BACKOFF_BASE_SECONDS", "0.2")
+
+    from pii_remover import analyzer_engine  # noqa: E402
+    from pipeline import get_set_go  # noqa: E402
+
+    files = make_files(args.files)
+    analyzer_engine().analyze("warm up", language="en")
+
+    def run(spec):
+        name, file_type, data = spec
+        start = time.perf_counter()
+        result = get_set_go(UploadedFile(data, name, file_type))
+        return time.perf_counter() - start, "error" not in result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        outcomes = list(executor.map(run, files))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies = [seconds for seconds, _ in outcomes]
+    failed = sum(1 for _, ok in outcomes if not ok)
+    print(f"files            {len(files)} ({failed} failed)")
+    print(f"workers          {args.workers}")
+    print(f"throughput       {len(files) / elapsed:.2f} files/s")
+    print(f"latency mean     {statistics.mean(latencies):.2f}s")
+    for share in (0.5, 0.95, 0.99):
+        print(f"latency p{int(share * 100):<7} {percentile(latencies, share):.2f}s")
+    print(f"server           {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
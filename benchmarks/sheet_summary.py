@@ -0,0 +1,93 @@
+"""
+Time and size of the sheet summary on synthetic anonymized frames of
+increasing row count, built from the whole frame and chunk by chunk as the
+Excel pipeline does. The summary size should not grow with the rows, and
+distinct counts are compared with the exact ones.
+
+    python benchmarks/sheet_summary.py --rows 10000 100000 1000000
+    python benchmarks/sheet_summary.py --rows 1000000 --chunk-rows 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from sheet_summary import SheetSummary  # noqa: E402
+
+DEPARTMENTS = ["Finance", "IT", "Security", "HR", "Legal", "Operations"]
+
+
+def make_frame(rows, seed=0):
+    # Columns as remove_pii_from_df leaves them: placeholders where PII was,
+    # low and high cardinality strings, numbers, dates and missing values
+    rng = np.random.default_rng(seed)
+    owner = np.where(rng.random(rows) < 0.7, "<PERSON>", "service account")
+    hostname = pd.Series(rng.integers(0, rows // 2 + 1, rows)).map("host-{:06d}".format)
+    cvss = pd.Series(rng.normal(6, 2, rows).round(1))
+    cvss[rng.random(rows) < 0.1] = np.nan
+    return pd.DataFrame(
+        {
+            "asset_id": np.arange(rows),
+            "hostname": hostname,
+            "owner": owner,
+            "department": rng.choice(DEPARTMENTS, rows),
+            "open_ports": rng.integers(0, 40, rows),
+            "cvss": cvss,
+            "last_scan": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 24, rows), unit="h"),
+            "notes": np.where(
+                rng.random(rows) < 0.5, None, "Contact <EMAIL_ADDRESS> for access"
+            ),
+        }
+    )
+
+
+def summarize(df, chunk_rows):
+    summary = SheetSummary()
+    for start in range(0, len(df), chunk_rows or len(df)):
+        summary.update(df.iloc[start : start + (chunk_rows or len(df))])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>9} {'whole s':>8} {'chunked s':>10} {'rows/s':>10} "
+        f"{'chars':>6} {'hostname distinct':>18} {'exact':>8}"
+    )
+    for rows in args.rows:
+        df = make_frame(rows)
+
+        start = time.perf_counter()
+        whole = summarize(df, 0)
+        whole_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunked = summarize(df, args.chunk_rows)
+        chunked_seconds = time.perf_counter() - start
+
+        distinct, _ = chunked.columns["hostname"].distinct()
+        print(
+            f"{rows:>9} {whole_seconds:>8.2f} {chunked_seconds:>10.2f} "
+            f"{rows / chunked_seconds:>10.0f} {len(chunked.render()):>6} "
+            f"{distinct:>18} {df['hostname'].nunique():>8}"
+        )
+
+    print()
+    print(chunked.render())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Compare spaCy models for Presidio analysis on a text corpus.
+
+Each model runs in its own process and reports throughput, peak RSS and how
+closely its detections agree with the reference model.
+
+    python benchmarks/spacy_models.py --corpus corpus.txt
+    python benchmarks/spacy_models.py --models en_core_web_sm en_core_web_lg --exclude ""
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+SAMPLE_CORPUS = [
+    "John Smith from Acme Corp logged into the VPN gateway in London at 10:42.",
+    "Contact the admin at jane.doe@example.com or call +1 212-555-0143.",
+    "Firewall rule 1042 allows TCP 443 from 10.20.0.0/16 to the DMZ.",
+    "EMP00123 reported a lost token HT-48213-AL to the Berlin service desk.",
+    "Quarterly audit by Deloitte found 3 unpatched Windows Server 2012 hosts.",
+    "Maria Garcia approved the change request for the Singapore datacenter.",
+    "",
+    "2024-05-01 12:00:00",
+]
+
+
+def load_corpus(path):
+    if not path:
+        return SAMPLE_CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+def _run_model(model_name, exclude, texts, repeat, queue):
+    sys.path.insert(0, SRC_DIR)
+    try:
+        from presidio_analyzer import AnalyzerEngine
+        from presidio_nlp_engine_config import create_nlp_engine_with_spacy
+
+        load_start = time.perf_counter()
+        nlp_engine, registry = create_nlp_engine_with_spacy(model_name, exclude)
+        analyzer = AnalyzerEngine(nlp_engine=nlp_engine, registry=registry)
+        load_seconds = time.perf_counter() - load_start
+
+        detections = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            detections = [
+                {
+                    (r.start, r.end, r.entity_type)
+                    for r in analyzer.analyze(text=text, language="en")
+                }
+                for text in texts
+            ]
+        seconds = time.perf_counter() - start
+
+        queue.put(
+            {
+                "model": model_name,
+                "load_seconds": load_seconds,
+                "texts_per_second": len(texts) * repeat / seconds if seconds else 0.0,
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                / 1024,
+                "detections": detections,
+            }
+        )
+    except Exception as e:
+        queue.put({"model": model_name, "error": str(e)})
+
+
+def run_model(model_name, exclude, texts, repeat):
+    # A fresh process per model so peak RSS is not shared between models
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_run_model, args=(model_name, exclude, texts, repeat, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def agreement(detections, reference):
+    # Micro-averaged F1 of exact (start, end, entity_type) spans
+    matched = predicted = expected = 0
+    for found, wanted in zip(detections, reference):
+        matched += len(found & wanted)
+        predicted += len(found)
+        expected += len(wanted)
+    if not predicted and not expected:
+        return 1.0
+    return 2 * matched / (predicted + expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", help="text file, one document per line")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["en_core_web_sm", "en_core_web_md", "en_core_web_lg"],
+    )
+    parser.add_argument(
+        "--reference", default="en_core_web_lg", help="model to compare against"
+    )
+    parser.add_argument(
+        "--exclude",
+        default=None,
+        help="comma separated components to exclude, defaults to PII_SPACY_EXCLUDE",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus)
+    exclude = None
+    if args.exclude is not None:
+        exclude = [name for name in args.exclude.split(",") if name]
+
+    results = {
+        name: run_model(name, exclude, texts, args.repeat) for name in args.models
+    }
+    reference = results.get(args.reference, {}).get("detections")
+
+    print(f"{len(texts)} texts x {args.repeat} runs, reference {args.reference}")
+    print(
+        f"{'model':<20}{'load s':>10}{'texts/s':>12}{'peak RSS MB':>14}{'agreement':>12}"
+    )
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<20}  error: {result['error']}")
+            continue
+        score = (
+            f"{agreement(result['detections'], reference):.3f}"
+            if reference is not None
+            else "n/a"
+        )
+        print(
+            f"{name:<20}{result['load_seconds']:>10.2f}"
+            f"{result['texts_per_second']:>12.1f}"
+            f"{result['peak_rss_mb']:>14.0f}{score:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-paragraph remove_pii_from_text vs coalesced remove_pii_from_texts on
+synthetic decks: checks both give the same output and reports analysis
+calls saved and time per deck.
+
+    python benchmarks/text_coalescing.py --decks 5 --slides 40
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from pii_remover import (  # noqa: E402
+    analyzer_engine,
+    remove_pii_from_text,
+    remove_pii_from_texts,
+)
+
+TITLES = ["Network overview", "Access review", "Incident summary", "Next steps"]
+BULLETS = [
+    "Owner: {name}",
+    "Contact {name} at {email}",
+    "Firewall rule 1042 allows TCP 443 from the DMZ",
+    "MFA enabled for all admin accounts",
+    "Escalate to the on-call engineer",
+    "Call {phone} for the service desk",
+    "",
+    "Confidential",
+]
+NAMES = ["John Smith", "Maria Garcia", "Wei Chen", "Priya Patel"]
+
+
+def make_deck(slides, rng):
+    # Paragraphs as extract_content_from_pptx returns them, footers included
+    paragraphs = []
+    for number in range(1, slides + 1):
+        paragraphs.append(rng.choice(TITLES))
+        for _ in range(rng.randint(3, 7)):
+            paragraphs.append(
+                rng.choice(BULLETS).format(
+                    name=rng.choice(NAMES),
+                    email=f"user{rng.randrange(20)}@example.com",
+                    phone=f"212-555-{rng.randrange(10000):04d}",
+                )
+            )
+        paragraphs.extend(["Company Confidential", str(number)])
+    return paragraphs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--decks", type=int, default=5)
+    parser.add_argument("--slides", type=int, default=40)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    decks = [make_deck(args.slides, rng) for _ in range(args.decks)]
+    analyzer_engine().analyze("warm up", language="en")
+
+    print(
+        f"{'deck':>4} {'units':>6} {'calls':>6} {'saved':>6} "
+        f"{'per unit s':>11} {'coalesced s':>12} {'same':>5}"
+    )
+    for number, paragraphs in enumerate(decks, start=1):
+        start = time.perf_counter()
+        expected = [remove_pii_from_text(paragraph) for paragraph in paragraphs]
+        per_unit = time.perf_counter() - start
+
+        report = {}
+        start = time.perf_counter()
+        actual = remove_pii_from_texts(paragraphs, report=report)
+        coalesced = time.perf_counter() - start
+
+        print(
+            f"{number:>4} {report['units']:>6} {report['analysis_calls']:>6} "
+            f"{report['calls_saved']:>6} {per_unit:>11.2f} {coalesced:>12.2f} "
+            f"{str(actual == expected):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
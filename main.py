@@ -1,8 +1,19 @@
 import os
+import sys
 
 
 def main():
-    os.system("streamlit run src/better_ui.py")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+    # python main.py batch ... processes files headless, see src/batch_cli.py
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch_cli import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
+
+    from serve import main as serve_main
+
+    sys.exit(serve_main(sys.argv[1:]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+import base64
+import json
+from abc import ABC, abstractmethod
+import threading
+import urllib.error
+import urllib.request
+
+import config
+from helpers import my_logger
+from image_payload import encode_payload
+from prompt_compaction import compact_pdf, compact_ppt
+from resilient_client import ResilientClient
+from sheet_summary import describe_sheets
+
+
+class AnalysisBackend(ABC):
+    """
+    What the pipeline needs from an LLM: every method takes already
+    sanitized content and returns the analysis as JSON text, or an
+    {"error": ...} JSON object when the analysis failed.
+    """
+
+    name = None
+    # ResilientClient whose counters the pipeline reports per file
+    limiter = None
+
+    @abstractmethod
+    def analyze_image(self, image) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def analyze_dataframe(self, sheets) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def analyze_embedded_image(self, image) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def analyze_embedded_image_batch(self, payloads) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def analyze_ppt(self, text, tables, images) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def analyze_pdf(self, text, images) -> str:
+        raise NotImplementedError
+
+
+class GeminiBackend(AnalysisBackend):
+    name = "gemini"
+
+    def __init__(self):
+        import gemini_data_analyzer
+
+        self.gemini = gemini_data_analyzer
+        self.limiter = gemini_data_analyzer.gemini_limiter
+
+    def analyze_image(self, image):
+        return self.gemini.analyze_image_with_gemini(image)
+
+    def analyze_dataframe(self, sheets):
+        return self.gemini.analyze_dataframe_with_gemini(sheets)
+
+    def analyze_embedded_image(self, image):
+        return self.gemini.analyze_embedded_image_with_gemini(image)
+
+    def analyze_embedded_image_batch(self, payloads):
+        return self.gemini.analyze_embedded_image_batch_with_gemini(payloads)
+
+    def analyze_ppt(self, text, tables, images):
+        return self.gemini.analyze_ppt_with_gemini(text, tables, images)
+
+    def analyze_pdf(self, text, images):
+        return self.gemini.analyze_pdf_with_gemini(text, images)
+
+
+class HttpBackend(AnalysisBackend):
+    """
+    Posts each analysis to an HTTP endpoint, such as the bundled
+    mock_llm_server, so the pipeline can run and be load tested offline.
+    Requests carry the sanitized text and the PNG bytes of every image, and
+    go through the same rate limits, retries and circuit breaker as Gemini.
+    :param url: base URL of the server, requests go to {url}/v1/analyze.
+    """
+
+    name = "http"
+
+    def __init__(self, url, timeout=None):
+        self.url = url.rstrip("/") + "/v1/analyze"
+        self.timeout = timeout or config.ANALYSIS_HTTP_TIMEOUT_SECONDS
+        self.limiter = ResilientClient(
+            requests_per_minute=config.GEMINI_RPM,
+            tokens_per_minute=0,
+            max_retries=config.GEMINI_MAX_RETRIES,
+            backoff_base=config.GEMINI_BACKOFF_BASE_SECONDS,
+            backoff_max=config.GEMINI_BACKOFF_MAX_SECONDS,
+            failure_threshold=config.GEMINI_BREAKER_FAILURES,
+            reset_seconds=config.GEMINI_BREAKER_RESET_SECONDS,
+        )
+
+    def _post(self, payload):
+        body = json.dumps(payload).encode()
+
+        def _request():
+            request = urllib.request.Request(
+                self.url,
+                data=body,
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return response.read().decode()
+            except urllib.error.HTTPError:
+                raise
+            except urllib.error.URLError as e:
+                # Connection refused/reset, retried like other transport errors
+                raise ConnectionError(str(e.reason)) from e
+
+        return self.limiter.call(_request, payload_bytes=len(body))
+
+    def _analyze(self, task, text="", payloads=()):
+        try:
+            return self._post(
+                {
+                    "task": task,
+                    "text": text,
+                    "images": [base64.b64encode(data).decode() for data, _ in payloads],
+                    "mime_types": [mime_type for _, mime_type in payloads],
+                }
+            )
+        except Exception as e:
+            my_logger.error(f"Error analyzing {task} with {self.url}: {e}")
+            return json.dumps({"error": str(e)})
+
+    def analyze_image(self, image):
+        return self._analyze("image", payloads=[encode_payload(image)])
+
+    def analyze_dataframe(self, sheets):
+        return self._analyze("dataframe", describe_sheets(sheets))
+
+    def analyze_embedded_image(self, image):
+        return self._analyze("embedded_image", payloads=[encode_payload(image)])
+
+    def analyze_embedded_image_batch(self, payloads):
+        response_text = self._analyze("embedded_image_batch", payloads=payloads)
+        try:
+            analyses = {
+                item["index"]: item["analysis"]
+                for item in json.loads(response_text)["images"]
+            }
+        except Exception:
+            return [response_text] * len(payloads)
+        return [
+            analyses.get(number)
+            or json.dumps({"error": f"No analysis returned for image {number}"})
+            for number in range(1, len(payloads) + 1)
+        ]
+
+    def analyze_ppt(self, text, tables, images):
+        if config.PROMPT_COMPACTION:
+            return self._analyze("ppt", compact_ppt(text, tables, images))
+        return self._analyze("ppt", f"text:{text}, tables:{tables}, images:{images}")
+
+    def analyze_pdf(self, text, images):
+        if config.PROMPT_COMPACTION:
+            return self._analyze("pdf", compact_pdf(text, images))
+        return self._analyze("pdf", f"text:{text}, images:{images}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> AnalysisBackend:
+    # Built once per process for the configured PII_ANALYSIS_BACKEND
+    global _backend
+
+    with _backend_lock:
+        if _backend is None or _backend.name != config.ANALYSIS_BACKEND:
+            if config.ANALYSIS_BACKEND == "gemini":
+                _backend = GeminiBackend()
+            elif config.ANALYSIS_BACKEND == "http":
+                _backend = HttpBackend(config.ANALYSIS_BACKEND_URL)
+            else:
+                raise ValueError(f"Unknown analysis backend: {config.ANALYSIS_BACKEND}")
+        return _backend
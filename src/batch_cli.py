@@ -0,0 +1,234 @@
+"""
+Process files without the web UI: every supported file under the given
+directories, globs or paths goes through the pipeline on a pool of workers
+and one record per file is written to a JSONL or Parquet file. Files already
+in the output are skipped, so an interrupted run resumes where it stopped.
+
+    python main.py batch reports/ "scans/**/*.png" --output results.jsonl
+    python src/batch_cli.py reports/ --output results.parquet --workers 8
+"""
+
+import argparse
+import glob
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+FILE_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+COLUMNS = ["path", "type", "size", "status", "seconds", "result"]
+
+
+class LocalFile(io.BufferedReader):
+    # A file on disk with the parts of Streamlit's UploadedFile the pipeline
+    # uses; name is the path
+    def __init__(self, path):
+        super().__init__(io.FileIO(path))
+        self.type = FILE_TYPES[os.path.splitext(path)[1].lower()]
+        self.size = os.path.getsize(path)
+
+
+def expand_inputs(inputs, recursive=True):
+    """
+    Supported files under the given directories, glob patterns and paths,
+    as sorted absolute paths without duplicates.
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            pattern = os.path.join(entry, "**", "*") if recursive else entry + "/*"
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(entry):
+            candidates = glob.glob(entry, recursive=True)
+        else:
+            candidates = [entry]
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in FILE_TYPES:
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def _checkpoint_path(output):
+    # Parquet cannot be appended to, so records of a run go to a JSONL
+    # checkpoint next to it that is folded into the Parquet file at the end
+    return output + ".partial.jsonl" if output.endswith(".parquet") else output
+
+
+def _read_jsonl(path):
+    records = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # The last line of a run that was killed mid-write
+                    continue
+    return records
+
+
+def read_records(output):
+    records = []
+    if output.endswith(".parquet") and os.path.exists(output):
+        import pandas as pd
+
+        records = pd.read_parquet(output).to_dict("records")
+        for record in records:
+            record["result"] = json.loads(record["result"])
+    return records + _read_jsonl(_checkpoint_path(output))
+
+
+def write_parquet(output):
+    import pandas as pd
+
+    records = read_records(output)
+    # Later records of a file (retried failures) replace earlier ones
+    latest = {record["path"]: record for record in records}
+    # An empty run still writes the file, with the columns and no rows
+    df = pd.DataFrame(list(latest.values()), columns=COLUMNS)
+    df["result"] = df["result"].map(json.dumps)
+    df.to_parquet(output + ".tmp", index=False)
+    os.replace(output + ".tmp", output)
+    os.remove(_checkpoint_path(output))
+
+
+def process_path(path):
+    from pipeline import get_set_go
+
+    start = time.perf_counter()
+    try:
+        with LocalFile(path) as input_file:
+            result = get_set_go(input_file)
+    except Exception as e:
+        result = {"error": str(e)}
+    return {
+        "path": path,
+        "type": FILE_TYPES[os.path.splitext(path)[1].lower()],
+        "size": os.path.getsize(path),
+        "status": "error" if not result or "error" in result else "ok",
+        "seconds": round(time.perf_counter() - start, 3),
+        "result": result or {},
+    }
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def print_summary(records, skipped, seconds):
+    failed = [record for record in records if record["status"] != "ok"]
+    megabytes = sum(record["size"] for record in records) / 2**20
+    print(f"files      {len(records) + skipped} ({skipped} skipped, already done)")
+    print(f"processed  {len(records)} ({len(failed)} failed)")
+    print(f"elapsed    {seconds:.1f}s")
+    if records and seconds:
+        latencies = [record["seconds"] for record in records]
+        print(
+            f"throughput {len(records) / seconds:.2f} files/s, "
+            f"{megabytes / seconds:.2f} MB/s"
+        )
+        print(
+            f"latency    mean {statistics.mean(latencies):.2f}s, "
+            f"p50 {_percentile(latencies, 0.5):.2f}s, "
+            f"p95 {_percentile(latencies, 0.95):.2f}s"
+        )
+    for record in failed[:10]:
+        print(f"failed     {record['path']}: {record['result'].get('error')}")
+    if len(failed) > 10:
+        print(f"failed     ... {len(failed) - 10} more")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inputs", nargs="+", help="directories, globs or files")
+    parser.add_argument(
+        "--output", required=True, help="results file, .jsonl or .parquet"
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--no-recursive", action="store_true", help="do not descend into directories"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="process files whose earlier record is an error again",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.output.endswith((".jsonl", ".parquet")):
+        parser.error("--output must end in .jsonl or .parquet")
+    if args.output.endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet output needs pyarrow: pip install pyarrow")
+
+    import dotenv
+
+    dotenv.load_dotenv()
+    # Engines are cached with st.cache_resource, which works without a
+    # Streamlit server but warns about the missing runtime
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    import config
+
+    if config.ANALYSIS_BACKEND == "gemini" and not os.getenv("GEMINI_API_KEY"):
+        parser.error("GEMINI_API_KEY is not set (or use PII_ANALYSIS_BACKEND=http)")
+
+    paths = expand_inputs(args.inputs, recursive=not args.no_recursive)
+    done = {
+        record["path"]
+        for record in read_records(args.output)
+        if record["status"] == "ok" or not args.retry_failed
+    }
+    pending = [path for path in paths if path not in done]
+    print(f"{len(paths)} files found, {len(pending)} to process")
+
+    from pii_remover import analyzer_engine
+
+    analyzer_engine()
+
+    records = []
+    start = time.perf_counter()
+    checkpoint = _checkpoint_path(args.output)
+    with (
+        open(checkpoint, "a", encoding="utf-8") as out,
+        ThreadPoolExecutor(
+            max_workers=max(1, args.workers), thread_name_prefix="batch"
+        ) as executor,
+    ):
+        futures = [executor.submit(process_path, path) for path in pending]
+        for number, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            records.append(record)
+            print(
+                f"[{number}/{len(pending)}] {record['status']:<5} "
+                f"{record['seconds']:>7.1f}s {record['path']}"
+            )
+
+    if args.output.endswith(".parquet"):
+        write_parquet(args.output)
+
+    print_summary(records, len(paths) - len(pending), time.perf_counter() - start)
+    return 1 if any(record["status"] != "ok" for record in records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,12 @@ import streamlit as st
 import pandas as pd
 from typing import List
 
+import config
 from pipeline import get_set_go
+from gemini_data_analyzer import require_api_key
+from warmup import readiness, start_warmup
 from helpers import list_to_html_ol, my_logger
 from models import ProcessedFile, filetypes
-from generate_ppt import create_presentation
 
 st.set_page_config(page_title="File Analyser", layout="wide")
 st.title("PII remover and analyser")
@@ -14,6 +16,17 @@ st.page_link(
     label="GitHub Repo",
 )
 
+if config.ANALYSIS_BACKEND == "gemini":
+    require_api_key()
+
+if config.WARMUP:
+    start_warmup()
+    warmup_state = readiness()
+    if warmup_state["status"] == "warming":
+        st.sidebar.info("Loading PII detection models in the background...")
+    elif warmup_state["status"] == "failed":
+        st.sidebar.error(f"Model warm-up failed: {warmup_state['error']}")
+
 uploaded_files = st.file_uploader(
     "Upload files (.png, .jpg, .pdf, .xlsx, .pptx)",
     type=["png", "jpg", "jpeg", "pdf", "xlsx", "pptx"],
@@ -194,6 +207,8 @@ if generate_ppt:
             st.warning("Please upload files before generating PPT.")
             st.stop()
 
+        from generate_ppt import create_presentation
+
         report_dict = create_presentation(
             st.session_state["ppt_rows"],
         )
@@ -0,0 +1,263 @@
+import copy
+import glob
+import logging
+import os
+from typing import List, Optional
+
+import regex as re
+import yaml
+from presidio_analyzer import (
+    EntityRecognizer,
+    LocalRecognizer,
+    PatternRecognizer,
+    RecognizerResult,
+)
+from presidio_analyzer.context_aware_enhancers import LemmaContextAwareEnhancer
+
+logger = logging.getLogger("presidio-streamlit")
+
+REGEX_TIMEOUT_SECONDS = 5
+
+# Patterns that cannot live inside one alternation (backreferences refer to
+# group numbers that shift once the patterns are merged)
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def load_pattern_recognizers(patterns_dir) -> List[PatternRecognizer]:
+    """
+    Read every YAML file in patterns_dir into PatternRecognizers
+    :param patterns_dir: directory holding the custom recognizer YAML files.
+    """
+    recognizers = []
+    for path in sorted(glob.glob(os.path.join(patterns_dir, "*.yaml"))):
+        with open(path) as stream:
+            for recognizer_dict in yaml.safe_load(stream)["recognizers"]:
+                recognizers.append(PatternRecognizer.from_dict(recognizer_dict))
+    return recognizers
+
+
+class CombinedPatternRecognizer(LocalRecognizer):
+    """
+    Runs the patterns of many PatternRecognizers as one compiled alternation,
+    so each text is scanned once however many custom patterns exist.
+
+    The alternation only finds the positions where some pattern matches;
+    each pattern is then matched at those positions alone, so the results
+    are the ones the separate recognizers would return, overlapping matches
+    of different patterns included. They keep the entity type, score,
+    validation and context words of the recognizer that owns the pattern.
+    :param recognizers: the PatternRecognizers to merge.
+    """
+
+    def __init__(self, recognizers: List[PatternRecognizer], name=None):
+        self.members = {recognizer.id: recognizer for recognizer in recognizers}
+        self.context_enhancer = LemmaContextAwareEnhancer()
+
+        super().__init__(
+            supported_entities=sorted(
+                {recognizer.supported_entities[0] for recognizer in recognizers}
+            ),
+            name=name or "CombinedPatternRecognizer",
+            supported_language=(
+                recognizers[0].supported_language if recognizers else "en"
+            ),
+            # Context is applied per member in enhance_using_context
+            context=[],
+        )
+
+    def load(self) -> None:
+        self.combined = []
+        self.separate = []
+
+        by_flags = {}
+        for recognizer in self.members.values():
+            for pattern in recognizer.patterns:
+                if _BACKREFERENCE.search(pattern.regex):
+                    self.separate.append((recognizer, pattern))
+                else:
+                    by_flags.setdefault(recognizer.global_regex_flags, []).append(
+                        (recognizer, pattern)
+                    )
+
+        for flags, entries in by_flags.items():
+            self.combined.append(
+                (self._alternation(entries, 0, flags), entries, {}, flags)
+            )
+
+        for recognizer in self.members.values():
+            for pattern in recognizer.patterns:
+                pattern.compiled_regex = re.compile(
+                    pattern.regex, flags=recognizer.global_regex_flags
+                )
+                pattern.compiled_with_flags = recognizer.global_regex_flags
+
+    def analyze(self, text, entities, nlp_artifacts=None) -> List[RecognizerResult]:
+        by_recognizer = {}
+
+        for compiled, entries, suffixes, flags in self.combined:
+            try:
+                spans = self._candidate_spans(compiled, entries, suffixes, flags, text)
+            except TimeoutError:
+                logger.warning("Combined pattern scan timed out, scanning separately")
+                spans = self._separate_spans(entries, text)
+            for index, start, end in spans:
+                recognizer, pattern = entries[index]
+                self._add_result(
+                    by_recognizer.setdefault(recognizer.id, []),
+                    text,
+                    start,
+                    end,
+                    recognizer,
+                    pattern,
+                    entities,
+                )
+
+        for index, start, end in self._separate_spans(self.separate, text):
+            recognizer, pattern = self.separate[index]
+            self._add_result(
+                by_recognizer.setdefault(recognizer.id, []),
+                text,
+                start,
+                end,
+                recognizer,
+                pattern,
+                entities,
+            )
+
+        # Duplicates are removed per member recognizer, as each would on its
+        # own; overlaps between members are left to the analyzer
+        return [
+            result
+            for results in by_recognizer.values()
+            for result in EntityRecognizer.remove_duplicates(results)
+        ]
+
+    @staticmethod
+    def _alternation(entries, first, flags):
+        # Named p<index> so a match tells which pattern it is
+        return re.compile(
+            "|".join(
+                f"(?P<p{index}>{entries[index][1].regex})"
+                for index in range(first, len(entries))
+            ),
+            flags=flags,
+        )
+
+    def _candidate_spans(self, compiled, entries, suffixes, flags, text):
+        # (entry index, start, end) of every match each pattern's own
+        # finditer would return. The overlapped scan stops at every position
+        # where some pattern matches and reports the first alternative that
+        # does; the patterns after it are tried there through the alternation
+        # of the remaining ones (compiled on first use). ends holds where
+        # each pattern's next match may start
+        ends = [0] * len(entries)
+        for match in compiled.finditer(
+            text, overlapped=True, timeout=REGEX_TIMEOUT_SECONDS
+        ):
+            start = match.start()
+            while match:
+                index = int(match.lastgroup[1:])
+                if start >= ends[index]:
+                    ends[index] = max(match.end(), start + 1)
+                    yield index, start, match.end()
+                if index + 1 == len(entries):
+                    break
+                if index + 1 not in suffixes:
+                    suffixes[index + 1] = self._alternation(entries, index + 1, flags)
+                match = suffixes[index + 1].match(
+                    text, start, timeout=REGEX_TIMEOUT_SECONDS
+                )
+
+    @staticmethod
+    def _separate_spans(entries, text):
+        for index, (_, pattern) in enumerate(entries):
+            try:
+                for match in pattern.compiled_regex.finditer(
+                    text, timeout=REGEX_TIMEOUT_SECONDS
+                ):
+                    yield index, match.start(), match.end()
+            except TimeoutError:
+                logger.warning(
+                    f"Regex pattern '{pattern.name}' timed out after "
+                    f"{REGEX_TIMEOUT_SECONDS} seconds, skipping."
+                )
+
+    def _add_result(self, results, text, start, end, recognizer, pattern, entities):
+        entity_type = recognizer.supported_entities[0]
+        if entities and entity_type not in entities:
+            return
+
+        current_match = text[start:end]
+        if current_match == "":
+            return
+
+        score = pattern.score
+        validation_result = recognizer.validate_result(current_match)
+        if validation_result is not None:
+            score = (
+                EntityRecognizer.MAX_SCORE
+                if validation_result
+                else EntityRecognizer.MIN_SCORE
+            )
+        if recognizer.invalidate_result(current_match):
+            score = EntityRecognizer.MIN_SCORE
+        if score <= EntityRecognizer.MIN_SCORE:
+            return
+
+        explanation = PatternRecognizer.build_regex_explanation(
+            recognizer.name,
+            pattern.name,
+            pattern.regex,
+            pattern.score,
+            validation_result,
+            recognizer.global_regex_flags,
+        )
+        explanation.score = score
+
+        results.append(
+            RecognizerResult(
+                entity_type=entity_type,
+                start=start,
+                end=end,
+                score=score,
+                analysis_explanation=explanation,
+                recognition_metadata={
+                    RecognizerResult.RECOGNIZER_NAME_KEY: recognizer.name,
+                    RecognizerResult.RECOGNIZER_IDENTIFIER_KEY: self.id,
+                    "pattern_recognizer_id": recognizer.id,
+                },
+            )
+        )
+
+    def enhance_using_context(
+        self,
+        text,
+        raw_recognizer_results,
+        other_raw_recognizer_results,
+        nlp_artifacts,
+        context: Optional[List[str]] = None,
+    ) -> List[RecognizerResult]:
+        if not raw_recognizer_results:
+            return raw_recognizer_results
+
+        # Let the standard enhancer see each result as coming from its own
+        # recognizer so it uses that recognizer's context words
+        results = copy.deepcopy(raw_recognizer_results)
+        for result in results:
+            result.recognition_metadata[RecognizerResult.RECOGNIZER_IDENTIFIER_KEY] = (
+                result.recognition_metadata["pattern_recognizer_id"]
+            )
+
+        results = self.context_enhancer.enhance_using_context(
+            text=text,
+            raw_results=results,
+            nlp_artifacts=nlp_artifacts,
+            recognizers=list(self.members.values()),
+            context=context,
+        )
+
+        for result in results:
+            result.recognition_metadata[RecognizerResult.RECOGNIZER_IDENTIFIER_KEY] = (
+                self.id
+            )
+        return results
@@ -0,0 +1,187 @@
+import os
+
+import dotenv
+
+dotenv.load_dotenv()
+
+
+def env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_float(name, default):
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def env_list(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+# Start loading the Presidio engines on a background thread when the server
+# process starts (src/serve.py) or, under a bare streamlit run, with the
+# first session; READY_FILE is written once they are loaded
+WARMUP = env_bool("PII_WARMUP", True)
+READY_FILE = os.getenv("PII_READY_FILE", "")
+
+# spaCy pipeline: Presidio only reads tokens and entities, so everything but
+# the tokenizer and ner is excluded by default (the en_core_web_sm/md/lg ner
+# component carries its own embedding layer)
+SPACY_MODEL = os.getenv("PII_SPACY_MODEL", "en_core_web_lg")
+SPACY_EXCLUDE = env_list(
+    "PII_SPACY_EXCLUDE",
+    ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"],
+)
+
+# Scan all patterns/*.yaml recognizers with one combined regex
+COMBINED_CUSTOM_PATTERNS = env_bool("PII_COMBINED_CUSTOM_PATTERNS", True)
+
+# Skip NER for blank values and values with no letters or that are a bare
+# date/time; those go through the pattern recognizers alone. Off by
+# default: a pattern-tier value that still holds PII NER would have caught
+# (a name glued into a code, a location in a timestamp) is not redacted
+TIERED_DETECTION = env_bool("PII_TIERED_DETECTION", False)
+
+# DataFrame anonymization
+DF_BATCHED = env_bool("PII_DF_BATCHED", True)
+DF_DEDUPE = env_bool("PII_DF_DEDUPE", True)
+# Off by default: a sampled column may skip NER, trading recall for speed
+DF_PROFILE = env_bool("PII_DF_PROFILE", False)
+DF_BATCH_SIZE = env_int("PII_DF_BATCH_SIZE", 256)
+DF_N_PROCESS = env_int("PII_DF_N_PROCESS", 1)
+
+# Column profiling: a column is scanned regex-only (never skipped) only when
+# the sample bounds the share of missed values below PROFILE_MAX_MISS_RATE
+PROFILE_SAMPLE_SIZE = env_int("PII_PROFILE_SAMPLE_SIZE", 400)
+PROFILE_CONFIDENCE = env_float("PII_PROFILE_CONFIDENCE", 0.95)
+PROFILE_MAX_MISS_RATE = env_float("PII_PROFILE_MAX_MISS_RATE", 0.01)
+
+# Excel ingestion
+XLSX_CHUNK_ROWS = env_int("PII_XLSX_CHUNK_ROWS", 5000)
+XLSX_PREFETCH_CHUNKS = env_int("PII_XLSX_PREFETCH_CHUNKS", 2)
+
+# Persistent result cache shared by all sessions and processes
+CACHE_ENABLED = env_bool("PII_CACHE_ENABLED", True)
+CACHE_PATH = os.getenv("PII_CACHE_PATH", os.path.join(".cache", "results.sqlite3"))
+CACHE_MAX_BYTES = env_int("PII_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+# In-memory cache of Gemini responses keyed on model, config and prompt
+GEMINI_CACHE_MAX_ENTRIES = env_int("PII_GEMINI_CACHE_MAX_ENTRIES", 512)
+GEMINI_CACHE_TTL_SECONDS = env_int("PII_GEMINI_CACHE_TTL_SECONDS", 3600)
+
+# Parallel Gemini calls for the embedded images of one file
+GEMINI_MAX_CONCURRENCY = env_int("PII_GEMINI_MAX_CONCURRENCY", 8)
+
+# Send several embedded images per Gemini request instead of one each
+GEMINI_BATCH_IMAGES = env_bool("PII_GEMINI_BATCH_IMAGES", False)
+GEMINI_IMAGES_PER_REQUEST = env_int("PII_GEMINI_IMAGES_PER_REQUEST", 8)
+GEMINI_MAX_REQUEST_BYTES = env_int("PII_GEMINI_MAX_REQUEST_BYTES", 15 * 1024 * 1024)
+
+# Gemini client limits: requests and tokens per minute (0 disables a limit),
+# retries with jittered exponential backoff and a circuit breaker that fails
+# fast once this many consecutive calls failed
+GEMINI_RPM = env_int("PII_GEMINI_RPM", 1000)
+GEMINI_TPM = env_int("PII_GEMINI_TPM", 1_000_000)
+GEMINI_MAX_RETRIES = env_int("PII_GEMINI_MAX_RETRIES", 4)
+GEMINI_BACKOFF_BASE_SECONDS = env_float("PII_GEMINI_BACKOFF_BASE_SECONDS", 1.0)
+GEMINI_BACKOFF_MAX_SECONDS = env_float("PII_GEMINI_BACKOFF_MAX_SECONDS", 30.0)
+GEMINI_BREAKER_FAILURES = env_int("PII_GEMINI_BREAKER_FAILURES", 5)
+GEMINI_BREAKER_RESET_SECONDS = env_float("PII_GEMINI_BREAKER_RESET_SECONDS", 30.0)
+
+# Where analyses are sent: "gemini", or "http" for an endpoint speaking the
+# mock_llm_server protocol (offline runs and load tests)
+ANALYSIS_BACKEND = os.getenv("PII_ANALYSIS_BACKEND", "gemini").strip().lower()
+ANALYSIS_BACKEND_URL = os.getenv("PII_ANALYSIS_BACKEND_URL", "http://127.0.0.1:8765")
+ANALYSIS_HTTP_TIMEOUT_SECONDS = env_float("PII_ANALYSIS_HTTP_TIMEOUT_SECONDS", 60.0)
+
+# Image redaction: OCR runs on a copy downscaled to OCR_TARGET_DPI (scans)
+# or at most OCR_MAX_EDGE pixels on the long side, converted to grayscale and
+# optionally binarized; the boxes are mapped back onto the original image
+OCR_PREPROCESS = env_bool("PII_OCR_PREPROCESS", False)
+OCR_TARGET_DPI = env_int("PII_OCR_TARGET_DPI", 300)
+OCR_MAX_EDGE = env_int("PII_OCR_MAX_EDGE", 2000)
+OCR_GRAYSCALE = env_bool("PII_OCR_GRAYSCALE", True)
+OCR_BINARIZE = env_bool("PII_OCR_BINARIZE", False)
+
+# Redact and analyze each distinct embedded image of a file once: exact
+# copies match by hash. With IMAGE_DEDUPE_MAX_DISTANCE >= 0, near copies
+# also match when their 256-bit difference hashes are at most that many bits
+# apart and their thumbnails agree; screenshots that differ only in a few
+# characters can still match, so the default (-1) matches exact copies only
+IMAGE_DEDUPE = env_bool("PII_IMAGE_DEDUPE", True)
+IMAGE_DEDUPE_MAX_DISTANCE = env_int("PII_IMAGE_DEDUPE_MAX_DISTANCE", -1)
+
+# Embedded images smaller than this (from the image header) are skipped
+IMAGE_MIN_WIDTH = env_int("PII_IMAGE_MIN_WIDTH", 32)
+IMAGE_MIN_HEIGHT = env_int("PII_IMAGE_MIN_HEIGHT", 32)
+IMAGE_MIN_BYTES = env_int("PII_IMAGE_MIN_BYTES", 512)
+
+# Redact embedded images on this many worker processes, each with its own
+# OCR engine (0 or 1 redacts in the app process); a Tesseract run is stopped
+# after OCR_TIMEOUT_SECONDS (0 disables)
+OCR_WORKERS = env_int("PII_OCR_WORKERS", 0)
+OCR_TIMEOUT_SECONDS = env_int("PII_OCR_TIMEOUT_SECONDS", 120)
+
+# Sanitize all paragraphs (PPTX) or pages (PDF) of a file in one batched pass
+# instead of one analyze/anonymize round per unit
+TEXT_COALESCE = env_bool("PII_TEXT_COALESCE", True)
+
+# Texts longer than TEXT_CHUNK_CHARS (long PDF pages) are analyzed as chunks
+# cut on line (else sentence or whitespace) boundaries, overlapping by up to
+# TEXT_CHUNK_OVERLAP characters; TEXT_N_PROCESS processes run the spaCy pass
+# over them
+TEXT_CHUNK_CHARS = env_int("PII_TEXT_CHUNK_CHARS", 10000)
+TEXT_CHUNK_OVERLAP = env_int("PII_TEXT_CHUNK_OVERLAP", 200)
+TEXT_N_PROCESS = env_int("PII_TEXT_N_PROCESS", 1)
+
+# PDFs are processed page by page: extraction runs on a background thread at
+# most PDF_PREFETCH_PAGES pages ahead of sanitization, so memory stays flat
+# with page count (off extracts the whole document first)
+PDF_STREAMING = env_bool("PII_PDF_STREAMING", True)
+PDF_PREFETCH_PAGES = env_int("PII_PDF_PREFETCH_PAGES", 4)
+
+# Redacted images are uploaded as PNG when that fits IMAGE_PAYLOAD_MAX_BYTES,
+# else as JPEG down to IMAGE_PAYLOAD_MIN_QUALITY and then at smaller sizes;
+# the long edge is capped at IMAGE_PAYLOAD_MAX_EDGE pixels first (0 disables
+# either limit)
+IMAGE_PAYLOAD_MAX_BYTES = env_int("PII_IMAGE_PAYLOAD_MAX_BYTES", 1_500_000)
+IMAGE_PAYLOAD_MAX_EDGE = env_int("PII_IMAGE_PAYLOAD_MAX_EDGE", 3072)
+IMAGE_PAYLOAD_MIN_QUALITY = env_int("PII_IMAGE_PAYLOAD_MIN_QUALITY", 60)
+
+# PPTX and PDF prompts are compacted: whitespace normalized, empty paragraphs
+# and failed image analyses dropped, tables rendered as PROMPT_TABLE_FORMAT
+# ("csv" or "markdown") and everything fitted to about PROMPT_MAX_TOKENS
+PROMPT_COMPACTION = env_bool("PII_PROMPT_COMPACTION", True)
+PROMPT_MAX_TOKENS = env_int("PII_PROMPT_MAX_TOKENS", 30000)
+PROMPT_TABLE_FORMAT = os.getenv("PII_PROMPT_TABLE_FORMAT", "csv").strip().lower()
+
+# Spreadsheets are described to the model by a fixed-size summary per sheet
+# (row count; dtypes, null rate, distinct count, range and the
+# SHEET_SUMMARY_TOP_K most frequent values of the first
+# SHEET_SUMMARY_MAX_COLUMNS columns; the first SHEET_SUMMARY_SAMPLE_ROWS
+# rows) instead of its first five rows
+SHEET_SUMMARY = env_bool("PII_SHEET_SUMMARY", True)
+SHEET_SUMMARY_TOP_K = env_int("PII_SHEET_SUMMARY_TOP_K", 5)
+SHEET_SUMMARY_MAX_COLUMNS = env_int("PII_SHEET_SUMMARY_MAX_COLUMNS", 40)
+SHEET_SUMMARY_SAMPLE_ROWS = env_int("PII_SHEET_SUMMARY_SAMPLE_ROWS", 3)
@@ -1,29 +1,34 @@
-import io
 import dotenv
 import os
+import threading
+import hashlib
 import streamlit as st
-from google import genai
-from google.genai import types
 import json
 
+import config
 from helpers import my_logger
+from image_payload import encode_payload
+from prompt_compaction import compact_pdf, compact_ppt
+from resilient_client import ResilientClient
+from sheet_summary import describe_sheets
+from response_cache import ResponseCache
 
 dotenv.load_dotenv()
 
-GEMINI_API_KEY = dotenv.get_key(".env", "GEMINI_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not GEMINI_API_KEY:
-    if "GEMINI_API_KEY" in st.session_state:
-        GEMINI_API_KEY = st.session_state.GEMINI_API_KEY
-    else:
-        st.set_page_config(page_title="File Analyser", layout="wide")
-        st.title("PII remover and analyser")
-        st.page_link(
-            "https://github.com/ashishanilsikaria/pii-remover-analyser",
-            label="GitHub Repo",
-        )
+# google.genai is imported and the client built on first use, so importing
+# this module (and the pipeline) stays cheap
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+_api_key = None
+
+
+def require_api_key():
+    global _api_key
+
+    api_key = os.getenv("GEMINI_API_KEY") or st.session_state.get("GEMINI_API_KEY")
 
+    if not api_key:
         st.sidebar.warning("Gemini API Key Required")
         api_key_input = st.sidebar.text_input(
             "Enter your Gemini API Key:",
@@ -33,18 +38,119 @@ if not GEMINI_API_KEY:
 
         if api_key_input:
             st.session_state.GEMINI_API_KEY = api_key_input
-            GEMINI_API_KEY = api_key_input
             st.sidebar.success("API Key saved!")
             st.rerun()
         else:
             st.error("Please enter your Gemini API Key in the sidebar to continue.")
             st.stop()
 
-if not GEMINI_API_KEY:
-    st.error("Gemini API Key is required to proceed.")
-    st.stop()
+    _api_key = api_key
+    return api_key
+
+
+def get_client():
+    global _client, _client_key
+
+    api_key = _api_key or os.getenv("GEMINI_API_KEY")
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            from google import genai
+
+            _client = genai.Client(api_key=api_key)
+            _client_key = api_key
+        return _client
+
+
+def _json_config(response_schema=None):
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=0),
+        response_mime_type="application/json",
+        response_schema=response_schema,
+    )
+
+
+MODEL = "gemini-2.5-flash"
+
+response_cache = ResponseCache(
+    max_entries=config.GEMINI_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.GEMINI_CACHE_TTL_SECONDS,
+)
+
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+gemini_limiter = ResilientClient(
+    requests_per_minute=config.GEMINI_RPM,
+    tokens_per_minute=config.GEMINI_TPM,
+    max_retries=config.GEMINI_MAX_RETRIES,
+    backoff_base=config.GEMINI_BACKOFF_BASE_SECONDS,
+    backoff_max=config.GEMINI_BACKOFF_MAX_SECONDS,
+    failure_threshold=config.GEMINI_BREAKER_FAILURES,
+    reset_seconds=config.GEMINI_BREAKER_RESET_SECONDS,
+)
+
+# Gemini bills an image as 258 tokens, text is roughly 4 characters a token
+IMAGE_TOKENS = 258
+
+
+def _estimate_tokens(contents):
+    return sum(
+        len(part) // 4 + 1 if isinstance(part, str) else IMAGE_TOKENS
+        for part in contents
+    )
+
+
+def _payload_bytes(contents):
+    return sum(
+        len(part.encode()) if isinstance(part, str) else len(part.inline_data.data)
+        for part in contents
+    )
+
+
+def _used_tokens(response):
+    return response.usage_metadata.total_token_count
+
+
+def _request_key(model, contents, generate_config):
+    digest = hashlib.sha256()
+    digest.update(model.encode())
+    digest.update(generate_config.model_dump_json(exclude_none=True).encode())
+    for part in contents:
+        if isinstance(part, str):
+            digest.update(b"text:" + part.encode())
+        elif getattr(part, "inline_data", None) is not None:
+            digest.update(f"blob:{part.inline_data.mime_type}:".encode())
+            digest.update(part.inline_data.data)
+        else:
+            digest.update(b"part:" + part.model_dump_json(exclude_none=True).encode())
+    return digest.hexdigest()
+
+
+def _generate(contents, response_schema=None):
+    # Identical prompts are answered from response_cache, and identical
+    # requests already in flight share one upstream call
+    generate_config = _json_config(response_schema)
+    key = _request_key(MODEL, contents, generate_config)
+
+    def _call():
+        response = gemini_limiter.call(
+            lambda: get_client().models.generate_content(
+                model=MODEL, contents=contents, config=generate_config
+            ),
+            estimated_tokens=_estimate_tokens(contents),
+            used_tokens=_used_tokens,
+            payload_bytes=_payload_bytes(contents),
+        )
+        return response.text
+
+    return response_cache.get_or_compute(key, _call)
+
+
+def _image_part(payload):
+    from google.genai import types
+
+    data, mime_type = payload
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
 
 
 prompt = """You are a security consultant. Analyse and provide insights in a few lines. Don't add any additional text."""
@@ -67,57 +173,66 @@ Here is the exact format to follow:
   "key_findings": [
   ]
 }"""
+prompt_for_image_batch = """You are given several images, each introduced by its number ("Image 1:", "Image 2:", ...).
+Analyse every image separately and return one entry per image in "images", with "index" set to the image number and "analysis" holding the insights for that image only."""
+
+image_batch_schema = {
+    "type": "OBJECT",
+    "properties": {
+        "images": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "index": {"type": "INTEGER"},
+                    "analysis": {"type": "STRING"},
+                },
+                "required": ["index", "analysis"],
+            },
+        }
+    },
+    "required": ["images"],
+}
+
 if_multiple_occurrences = "If a text appears across multiple images without any symantic meaning consider it to be brand name and ignore it."
 
 
 # Analyze direct image input
 def analyze_image_with_gemini(image):
     try:
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        data = buf.getvalue()
         # my_file = client.files.upload(file=buf)
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
+        response_text = _generate(
+            [
                 prompt,
                 prompt_for_image,
                 prompt_for_output,
-                genai.types.Part.from_bytes(data=data, mime_type="image/png"),
-            ],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
-                response_mime_type="application/json",
-            ),
+                _image_part(encode_payload(image)),
+            ]
         )
-        # my_logger.info(f"Image analysis result:\n{response.text}")
-        return response.text
+        # my_logger.info(f"Image analysis result:\n{response_text}")
+        return response_text
     except Exception as e:
         my_logger.error(f"Error analyzing image with gemini: {e}")
         return json.dumps({"error": str(e)})
 
 
-# Analyze dataframe content
+# Analyze dataframe content, either a single DataFrame or {sheet_name: DataFrame
+# or SheetSummary}
 def analyze_dataframe_with_gemini(df):
     try:
-        content = (
-            f"The following data was found in the excel file:{df.head().to_string()} "
+        content = "The following data was found in the excel file:" + describe_sheets(
+            df
         )
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
+        response_text = _generate(
+            [
                 prompt,
                 content,
                 prompt_for_output,
                 "There could be some inconsistency in the data, or it could contain NaN values. Please ignore those.",
-            ],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
-                response_mime_type="application/json",
-            ),
+            ]
         )
-        # my_logger.info(f"DataFrame analysis result:\n{response}")
-        return response.text
+        # my_logger.info(f"DataFrame analysis result:\n{response_text}")
+        return response_text
     except Exception as e:
         my_logger.error(f"Error analyzing dataframe with gemini: {e}")
         return json.dumps({"error": str(e)})
@@ -128,42 +243,55 @@ def analyze_embedded_image_with_gemini(image):
     try:
         # my_logger.info(f"Analyzing embedded image with Gemini...")
         # my_logger.info(f"Image type: {type(image)}")
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        data = buf.getvalue()
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
+        response_text = _generate(
+            [
                 prompt,
-                genai.types.Part.from_bytes(data=data, mime_type="image/png"),
-            ],
-            config=genai.types.GenerateContentConfig(
-                thinking_config=genai.types.ThinkingConfig(thinking_budget=0),
-                response_mime_type="application/json",
-            ),
+                _image_part(encode_payload(image)),
+            ]
         )
-        # my_logger.info(f"Embedded image analysis result:\n{response.text}")
-        return response.text
+        # my_logger.info(f"Embedded image analysis result:\n{response_text}")
+        return response_text
     except Exception as e:
         my_logger.error(f"Error analyzing embedded image with gemini: {e}")
         return json.dumps({"error": str(e)})
 
 
+# Analyze several embedded images, encoded as (bytes, mime_type) payloads, in
+# one request, one result each
+def analyze_embedded_image_batch_with_gemini(payloads):
+    try:
+        contents = [prompt, prompt_for_image_batch]
+        for number, payload in enumerate(payloads, start=1):
+            contents.extend([f"Image {number}:", _image_part(payload)])
+
+        response_text = _generate(contents, response_schema=image_batch_schema)
+
+        analyses = {
+            item["index"]: item["analysis"]
+            for item in json.loads(response_text)["images"]  # type: ignore
+        }
+        return [
+            analyses.get(number)
+            or json.dumps({"error": f"No analysis returned for image {number}"})
+            for number in range(1, len(payloads) + 1)
+        ]
+    except Exception as e:
+        my_logger.error(f"Error analyzing embedded image batch with gemini: {e}")
+        return [json.dumps({"error": str(e)})] * len(payloads)
+
+
 # Analyze pptx content
 def analyze_ppt_with_gemini(text, tables, images):
     try:
-        content = f"The following text:{text}, tables:{tables},and images:{images} were found in the pptx file."
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt, content, prompt_for_output, if_multiple_occurrences],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
-                response_mime_type="application/json",
-            ),
+        if config.PROMPT_COMPACTION:
+            content = compact_ppt(text, tables, images)
+        else:
+            content = f"The following text:{text}, tables:{tables},and images:{images} were found in the pptx file."
+        response_text = _generate(
+            [prompt, content, prompt_for_output, if_multiple_occurrences]
         )
-        # my_logger.info(f"PPTX analysis result:\n{response}")
-        return response.text
+        # my_logger.info(f"PPTX analysis result:\n{response_text}")
+        return response_text
     except Exception as e:
         my_logger.error(f"Error analyzing pptx content with gemini: {e}")
         return json.dumps({"error": str(e)})
@@ -172,17 +300,13 @@ def analyze_ppt_with_gemini(text, tables, images):
 # Analyze pdf content
 def analyze_pdf_with_gemini(text, images):
     try:
-        content = f"The following text:{text}, and images:{images} were found in the pdf file."
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt, content, prompt_for_output],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
-                response_mime_type="application/json",
-            ),
-        )
-        # my_logger.info(f"PDF analysis result:\n{response.text}")
-        return response.text
+        if config.PROMPT_COMPACTION:
+            content = compact_pdf(text, images)
+        else:
+            content = f"The following text:{text}, and images:{images} were found in the pdf file."
+        response_text = _generate([prompt, content, prompt_for_output])
+        # my_logger.info(f"PDF analysis result:\n{response_text}")
+        return response_text
     except Exception as e:
         my_logger.error(f"Error analyzing pdf content with gemini: {e}")
         return json.dumps({"error": str(e)})
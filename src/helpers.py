@@ -1,8 +1,10 @@
 import logging
+import io
 import json
-from pptx import Presentation
-from PyPDF2 import PdfReader
+import queue
+import threading
 
+import config
 
 # my_logger.debug('This is a debug message.')
 # my_logger.info('This is an informational message.')
@@ -20,10 +22,35 @@ def json_to_dict(json_string):
         return None
 
 
+def _keep_image(width, height, nbytes):
+    # Icons, bullets and spacers are not worth OCR and an analysis call
+    if width < config.IMAGE_MIN_WIDTH or height < config.IMAGE_MIN_HEIGHT:
+        return False
+    return nbytes is None or nbytes >= config.IMAGE_MIN_BYTES
+
+
+def iter_pptx_images(prs):
+    # Yields (bytes, ext) per picture, sized from the image header
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if shape.shape_type != 13:  # Picture type
+                continue
+            try:
+                image = shape.image  # type: ignore
+                width, height = image.size
+                if _keep_image(width, height, len(image.blob)):
+                    yield image.blob, image.ext
+            except Exception as e:
+                my_logger.error(f"Error reading image from PPTX: {e}")
+
+
 # Load the presentation
 def extract_content_from_pptx(file):
+    from pptx import Presentation
+
     prs = Presentation(file)
-    content = {"text": [], "tables": [], "images": []}
+    # Images are read lazily, while they are being processed
+    content = {"text": [], "tables": [], "images": iter_pptx_images(prs)}
 
     for slide in prs.slides:
         for shape in slide.shapes:
@@ -39,28 +66,73 @@ def extract_content_from_pptx(file):
                     table_data.append([cell.text for cell in row.cells])
                 content["tables"].append(table_data)
 
-            # Images
-            if shape.shape_type == 13:  # Picture type
-                image = shape.image  # type: ignore
-                image_bytes = image.blob
-                ext = image.ext
-                content["images"].append((image_bytes, ext))
-
     return content
 
 
+def _page_images(page):
+    # Width, height and encoded length come from the image dictionary, so
+    # filtered out images are never decoded
+    from PyPDF2.filters import _xobj_to_image
+
+    if "/Resources" not in page or "/XObject" not in page["/Resources"]:
+        return
+    x_objects = page["/Resources"]["/XObject"]
+    for name in x_objects:
+        x_object = x_objects[name]
+        if x_object.get("/Subtype") != "/Image":
+            continue
+        if not _keep_image(
+            int(x_object["/Width"]),
+            int(x_object["/Height"]),
+            # PyPDF2 drops /Length from a parsed stream's dictionary, the
+            # encoded bytes are its _data
+            len(getattr(x_object, "_data", b"")) or None,
+        ):
+            continue
+        extension, data = _xobj_to_image(x_object)
+        if extension is not None:
+            yield data
+
+
+def iter_pdf_images(reader):
+    # Yields image bytes one at a time
+    for page_number, page in enumerate(reader.pages, start=1):
+        try:
+            yield from _page_images(page)
+        except Exception as e:
+            my_logger.error(f"Error reading images from PDF page {page_number}: {e}")
+
+
+def iter_pdf_pages(file):
+    # Yields (page_number, text, image bytes) one page at a time. The reader
+    # caches every object it parses, so the cache is dropped after each page
+    # to keep memory flat however long the document is
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file)
+    for page_number in range(1, len(reader.pages) + 1):
+        page = reader.pages[page_number - 1]
+        text = page.extract_text() or ""
+        images = []
+        try:
+            images = list(_page_images(page))
+        except Exception as e:
+            my_logger.error(f"Error reading images from PDF page {page_number}: {e}")
+        reader.resolved_objects.clear()
+        yield page_number, text, images
+
+
 def extract_content_from_pdf(file):
+    from PyPDF2 import PdfReader
+
     try:
         reader = PdfReader(file)
-        content = {"text": [], "images": []}
+        content = {"text": [], "images": iter_pdf_images(reader)}
 
         for page in reader.pages:
             page_text = page.extract_text()
             if page_text:
                 content["text"].append(page_text)
-            for image_file_object in page.images:
-                content["images"].append(image_file_object.data)
-
 
         return content
     except Exception as e:
@@ -68,6 +140,146 @@ def extract_content_from_pdf(file):
         return {"text": [], "images": []}
 
 
+def _unique_headers(header_row):
+    headers = []
+    seen = {}
+    for i, name in enumerate(header_row):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+    return headers
+
+
+def _trim_row(row):
+    # Without trailing empty cells
+    row = tuple(row)
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end]
+
+
+def iter_excel_chunks(file, chunk_rows):
+    # Streams every sheet in read-only mode, yielding (sheet_name, DataFrame)
+    # chunks of at most chunk_rows rows so the whole workbook is never in memory
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    def _frame(chunk, headers):
+        # Short rows are padded with None
+        return pd.DataFrame(
+            [row + (None,) * (len(headers) - len(row)) for row in chunk],
+            columns=headers,
+        )
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            # Read-only mode trusts the sheet's <dimension>, which may be
+            # missing or wrong; rows are then as long as their last cell
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+            header_row = next(rows, None)
+            if header_row is None:
+                continue
+            header_row = _trim_row(header_row)
+            headers = _unique_headers(header_row)
+
+            chunk = []
+            for row in rows:
+                row = _trim_row(row)
+                if not row:
+                    continue
+                if len(row) > len(headers):
+                    # Cells right of the header get "Unnamed: N" columns,
+                    # like read_excel
+                    header_row += (None,) * (len(row) - len(header_row))
+                    headers = _unique_headers(header_row)
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    yield sheet.title, _frame(chunk, headers)
+                    chunk = []
+            if chunk:
+                yield sheet.title, _frame(chunk, headers)
+    finally:
+        workbook.close()
+
+
+def prefetch(iterable, max_pending):
+    # Consumes iterable on a background thread so producing the next item
+    # overlaps with processing the current one; at most max_pending items
+    # are buffered
+    pending = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+    done = object()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put((item, None)):
+                    return
+        except Exception as e:
+            _put((done, e))
+            return
+        _put((done, None))
+
+    threading.Thread(target=_produce, daemon=True).start()
+
+    try:
+        while True:
+            item, error = pending.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def encode_png(image):
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def image_dhash(data, hash_size=16, thumbnail_size=32):
+    # Difference hash of encoded image bytes: one bit per horizontally adjacent
+    # pixel pair of a (hash_size + 1) x hash_size grayscale thumbnail, so
+    # re-encoded or resized copies of an image hash (nearly) the same. Also
+    # returns the aspect ratio and a thumbnail_size square grayscale
+    # thumbnail to confirm a hash match pixel by pixel
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.draft("L", (4 * thumbnail_size, 4 * thumbnail_size))
+    width, height = image.size
+    gray = image.convert("L")
+    pixels = list(
+        gray.resize((hash_size + 1, hash_size), Image.Resampling.BOX).getdata()
+    )
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (hash_size + 1) + col + 1])
+    thumbnail = gray.resize((thumbnail_size, thumbnail_size), Image.Resampling.BOX)
+    return bits, width / max(height, 1), thumbnail.tobytes()
+
+
 def list_to_html_ol(cell):
     if isinstance(cell, list):
         return "<ul>" + "".join(f"<li>{item}</li>" for item in cell) + "</ul>"
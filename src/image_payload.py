@@ -0,0 +1,111 @@
+import io
+import threading
+
+import config
+from helpers import my_logger
+
+# One encode buffer per thread, reused across encode attempts and images.
+# It is only rewound, never truncated (truncating frees its memory), and
+# only the attempt that is sent is copied out of it
+_buffers = threading.local()
+
+JPEG_QUALITIES = (90, 80, 70, 60, 50, 40)
+
+
+def _encode(image, format, **options):
+    # Encoded size; the bytes stay in the buffer until the next encode
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = _buffers.buf = io.BytesIO()
+    buf.seek(0)
+    image.save(buf, format=format, **options)
+    return buf.tell()
+
+
+def _encoded(size):
+    with _buffers.buf.getbuffer() as view:
+        return view[:size].tobytes()
+
+
+def _fit_edge(image, max_edge):
+    from PIL import Image
+
+    if max_edge and max(image.size) > max_edge:
+        scale = max_edge / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, Image.Resampling.BOX)
+    return image
+
+
+def _jpeg_ready(image):
+    # JPEG has no alpha or palette, flatten onto white
+    from PIL import Image
+
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def encode_payload(image, max_bytes=None, max_edge=None, min_quality=None):
+    """
+    Encode a redacted image for upload within a byte budget: lossless PNG
+    when it fits (screenshots and diagrams usually do), else JPEG at falling
+    quality, else JPEG at smaller sizes. Returns (bytes, mime_type); the
+    smallest attempt is returned if nothing fits.
+    :param max_bytes: byte budget, 0 disables it (always PNG).
+    :param max_edge: the long edge is first capped at this many pixels,
+        0 keeps the original size.
+    :param min_quality: lowest JPEG quality tried before downscaling.
+    """
+    max_bytes = config.IMAGE_PAYLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    max_edge = config.IMAGE_PAYLOAD_MAX_EDGE if max_edge is None else max_edge
+    min_quality = (
+        config.IMAGE_PAYLOAD_MIN_QUALITY if min_quality is None else min_quality
+    )
+
+    original_size = image.size
+    data, mime_type, size = _fit_budget(
+        _fit_edge(image, max_edge), max_bytes, min_quality
+    )
+    my_logger.debug(
+        f"Image payload: {original_size[0]}x{original_size[1]} sent as "
+        f"{mime_type} {size[0]}x{size[1]}, {len(data)} bytes"
+    )
+    return data, mime_type
+
+
+def _fit_budget(image, max_bytes, min_quality):
+    size = _encode(image, "PNG")
+    if not max_bytes or size <= max_bytes:
+        return _encoded(size), "image/png", image.size
+
+    # (size, image, JPEG quality or None for PNG) of the smallest attempt,
+    # encoded again if nothing fits
+    best = (size, image, None)
+    flat = _jpeg_ready(image)
+    qualities = [q for q in JPEG_QUALITIES if q >= min_quality] or [min_quality]
+    while True:
+        for quality in qualities:
+            size = _encode(flat, "JPEG", quality=quality, optimize=True)
+            if size <= max_bytes:
+                return _encoded(size), "image/jpeg", flat.size
+            if size < best[0]:
+                best = (size, flat, quality)
+        if max(flat.size) <= 256:
+            size, smallest, quality = best
+            my_logger.warning(
+                f"Image payload is {size} bytes, over the "
+                f"{max_bytes} byte budget at the smallest size"
+            )
+            if quality is None:
+                return _encoded(_encode(smallest, "PNG")), "image/png", smallest.size
+            size = _encode(smallest, "JPEG", quality=quality, optimize=True)
+            return _encoded(size), "image/jpeg", smallest.size
+        # Smaller sizes only at the lowest quality
+        qualities = qualities[-1:]
+        flat = _fit_edge(flat, max(256, int(max(flat.size) * 0.75)))
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the analysis LLM, used with PII_ANALYSIS_BACKEND=http to
+run the pipeline offline. Answers POST /v1/analyze with schema-valid JSON
+after a configurable delay and injects errors at a configurable rate.
+GET /stats returns request, error and byte counters.
+
+    python src/mock_llm_server.py --port 8765 --latency-ms 300 --error-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def analysis_for(payload):
+    task = payload.get("task")
+    images = payload.get("images") or []
+    if task == "embedded_image_batch":
+        return {
+            "images": [
+                {"index": number, "analysis": f"Mock analysis of image {number}"}
+                for number in range(1, len(images) + 1)
+            ]
+        }
+    if task == "embedded_image":
+        return {"analysis": "Mock analysis of an embedded image"}
+    return {
+        "file_description": {
+            "heading": f"Mock {task} analysis",
+            "description": (
+                f"Generated offline from {len(payload.get('text') or '')} "
+                f"characters of text and {len(images)} images."
+            ),
+        },
+        "key_findings": [
+            "Mock finding about access control",
+            "Mock finding about network exposure",
+            "Mock finding about data handling",
+        ],
+    }
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    :param latency_ms: base delay of every response.
+    :param jitter_ms: uniform random delay added on top.
+    :param tail_rate: share of requests that take tail_ms longer.
+    :param error_rate: share of requests answered with error_status.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency_ms=200,
+        jitter_ms=100,
+        tail_rate=0.0,
+        tail_ms=2000,
+        error_rate=0.0,
+        error_status=429,
+        seed=None,
+    ):
+        super().__init__(address, MockLLMHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "bytes_received": 0}
+        self.lock = threading.Lock()
+
+    def draw(self):
+        # Decide delay and outcome of one request
+        with self.lock:
+            delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            if self.random.random() < self.tail_rate:
+                delay += self.tail_ms
+            failed = self.random.random() < self.error_rate
+        return delay / 1000, failed
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self._send_json(404, {"error": "Not found"})
+            return
+        with self.server.lock:
+            self._send_json(200, dict(self.server.stats))
+
+    def do_POST(self):
+        if self.path != "/v1/analyze":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        delay, failed = self.server.draw()
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["bytes_received"] += len(body)
+            if failed:
+                self.server.stats["errors"] += 1
+
+        time.sleep(delay)
+        if failed:
+            self._send_json(self.server.error_status, {"error": "Injected error"})
+            return
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"error": "Request body is not JSON"})
+            return
+        self._send_json(200, analysis_for(payload))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_background(host="127.0.0.1", port=0, **options):
+    """
+    Start a MockLLMServer on a daemon thread, port 0 picks a free port.
+    Returns the server, its URL is f"http://{host}:{server.server_port}".
+    """
+    server = MockLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-ms", type=float, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        (args.host, args.port),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    print(f"Mock LLM server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw
+from presidio_image_redactor import ImagePreprocessor
+
+
+def ocr_scale(size, dpi=None, target_dpi=300, max_edge=2000):
+    """
+    Downscale factor (never above 1) for OCR: scans above target_dpi are
+    brought down to it, and the long edge is capped at max_edge pixels.
+    :param size: (width, height) of the image.
+    :param dpi: resolution from the image metadata, if any.
+    """
+    scale = 1.0
+    if dpi and target_dpi and dpi > target_dpi:
+        scale = target_dpi / dpi
+    if max_edge and max(size) * scale > max_edge:
+        scale = max_edge / max(size)
+    return scale
+
+
+def otsu_threshold(gray):
+    # Grey level that best separates text from background
+    histogram = np.bincount(np.asarray(gray).ravel(), minlength=256)
+    levels = np.arange(256)
+    weight_background = np.cumsum(histogram)
+    weight_foreground = weight_background[-1] - weight_background
+    sum_background = np.cumsum(histogram * levels)
+    mean_background = sum_background / np.maximum(weight_background, 1)
+    mean_foreground = (sum_background[-1] - sum_background) / np.maximum(
+        weight_foreground, 1
+    )
+    between = (
+        weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+    )
+    return int(np.argmax(between))
+
+
+def _image_dpi(image):
+    dpi = image.info.get("dpi")
+    if isinstance(dpi, (tuple, list)):
+        dpi = max(dpi)
+    try:
+        return float(dpi) if dpi else None
+    except (TypeError, ValueError):
+        return None
+
+
+class OcrPreprocessor(ImagePreprocessor):
+    """
+    Prepares images for Tesseract: downscales to ocr_scale, converts to
+    grayscale and optionally binarizes with Otsu's threshold. The scale factor
+    is returned as metadata, which ImageAnalyzerEngine uses to map the OCR
+    boxes back to the original resolution.
+    """
+
+    def __init__(self, target_dpi=300, max_edge=2000, grayscale=True, binarize=False):
+        super().__init__(use_greyscale=grayscale)
+        self.target_dpi = target_dpi
+        self.max_edge = max_edge
+        self.grayscale = grayscale
+        self.binarize = binarize
+
+    def scale_for(self, image):
+        return ocr_scale(image.size, _image_dpi(image), self.target_dpi, self.max_edge)
+
+    def preprocess_image(self, image):
+        metadata = {}
+        scale = self.scale_for(image)
+        if scale < 1:
+            size = (
+                max(1, round(image.width * scale)),
+                max(1, round(image.height * scale)),
+            )
+            image = image.resize(size, Image.Resampling.BOX)
+            metadata["scale_factor"] = scale
+
+        if self.grayscale or self.binarize:
+            image = image.convert("L")
+        if self.binarize:
+            threshold = otsu_threshold(image)
+            image = image.point([255 if v > threshold else 0 for v in range(256)])
+
+        return image, metadata
+
+
+def redact_image(image_redactor, image, fill=(255, 0, 0), ocr_kwargs=None):
+    """
+    Same as ImageRedactorEngine.redact, except that boxes found on a
+    downscaled copy are padded by the rounding error of scaling them back,
+    so the fill still covers the text on the full-size image.
+    """
+    preprocessor = image_redactor.image_analyzer_engine.image_preprocessor
+    scale = (
+        preprocessor.scale_for(image)
+        if isinstance(preprocessor, OcrPreprocessor)
+        else 1
+    )
+    pad = math.ceil(1 / scale) if scale < 1 else 0
+
+    bboxes = image_redactor.image_analyzer_engine.analyze(image, ocr_kwargs=ocr_kwargs)
+
+    redacted = ImageChops.duplicate(image)
+    draw = ImageDraw.Draw(redacted)
+    for box in bboxes:
+        draw.rectangle(
+            [
+                box.left - pad,
+                box.top - pad,
+                box.left + box.width + pad,
+                box.top + box.height + pad,
+            ],
+            fill=fill,
+        )
+    return redacted
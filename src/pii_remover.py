@@ -1,18 +1,39 @@
 import io
+import random
+import re
+import threading
+from collections import Counter
 import streamlit as st
-from PIL import Image
 
-from presidio_analyzer import AnalyzerEngine
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerResult
+from presidio_analyzer.nlp_engine import NlpArtifacts
+from presidio_analyzer.predefined_recognizers import SpacyRecognizer
 from presidio_anonymizer import AnonymizerEngine
-from presidio_image_redactor import ImageRedactorEngine
 
+import config
 from helpers import my_logger
 from presidio_nlp_engine_config import create_nlp_engine_with_spacy
 
 
 @st.cache_resource(show_spinner=False)
 def image_redactor_engine():
-    return ImageRedactorEngine()
+    from presidio_image_redactor import ImageAnalyzerEngine, ImageRedactorEngine
+
+    if not config.OCR_PREPROCESS:
+        return ImageRedactorEngine()
+
+    from ocr_preprocessing import OcrPreprocessor
+
+    return ImageRedactorEngine(
+        image_analyzer_engine=ImageAnalyzerEngine(
+            image_preprocessor=OcrPreprocessor(
+                target_dpi=config.OCR_TARGET_DPI,
+                max_edge=config.OCR_MAX_EDGE,
+                grayscale=config.OCR_GRAYSCALE,
+                binarize=config.OCR_BINARIZE,
+            )
+        )
+    )
 
 
 @st.cache_resource(show_spinner=False)
@@ -21,36 +42,84 @@ def analyzer_engine():
     return AnalyzerEngine(nlp_engine=nlp_engine, registry=registry)
 
 
+@st.cache_resource(show_spinner=False)
+def batch_analyzer_engine():
+    return BatchAnalyzerEngine(analyzer_engine=analyzer_engine())
+
+
 @st.cache_resource(show_spinner=False)
 def anonymizer_engine():
     return AnonymizerEngine()
 
 
+@st.cache_resource(show_spinner=False)
+def ner_recognizer_names():
+    return {
+        recognizer.name
+        for recognizer in analyzer_engine().registry.recognizers
+        if isinstance(recognizer, SpacyRecognizer)
+    }
+
+
 def remove_pii_from_text(input_text):
     try:
-        results = analyzer_engine().analyze(
-            text=input_text,
-            language="en",
-            score_threshold=0.3,
-        )
+        if len(input_text) > config.TEXT_CHUNK_CHARS:
+            results = _analyze_texts([input_text], score_threshold=0.3)[0]
+        else:
+            results = _analyze_values([input_text], batched=False, score_threshold=0.3)[
+                0
+            ]
 
-        anonymized_text = anonymizer_engine().anonymize(
-            text=input_text, analyzer_results=results  # type: ignore
-        )
+        anonymized_text = _anonymize_value(input_text, results)
 
         # Debug: Display original and anonymized text
 
         # col1, col2 = st.columns(2)
         # col1.write(input_text)
-        # col2.write(anonymized_text.text)
+        # col2.write(anonymized_text)
 
-        return anonymized_text.text
+        return anonymized_text
     except Exception as e:
         my_logger.error(f"Error removing pii from text: {e}")
         return {"error": str(e)}
 
 
+def remove_pii_from_texts(input_texts, report=None):
+    # Sanitizes many text units (PPTX paragraphs, PDF pages) together: blank
+    # and repeated units are analyzed once and the rest share one batched
+    # nlp.pipe pass, while every unit gets exactly the output
+    # remove_pii_from_text would give it
+    try:
+        texts = list(input_texts)
+        distinct = list(dict.fromkeys(text for text in texts if text.strip()))
+
+        results = _analyze_texts(distinct, score_threshold=0.3)
+        anonymized = {
+            text: _anonymize_value(text, text_results)
+            for text, text_results in zip(distinct, results)
+        }
+
+        stats = {
+            "units": len(texts),
+            "analysis_calls": len(distinct),
+            "calls_saved": len(texts) - len(distinct),
+        }
+        my_logger.info(
+            f"Text: {stats['units']} units, {stats['analysis_calls']} analyzed "
+            f"in one batched pass, {stats['calls_saved']} analysis calls saved"
+        )
+        if report is not None:
+            report.update(stats)
+
+        return [anonymized.get(text, text) for text in texts]
+    except Exception as e:
+        my_logger.error(f"Error removing pii from texts: {e}")
+        return {"error": str(e)}
+
+
 def remove_pii_from_image(input_file):
+    from PIL import Image
+
     try:
 
         image_redactor = image_redactor_engine()
@@ -64,7 +133,21 @@ def remove_pii_from_image(input_file):
         else:
             image = Image.open(input_file)
 
-        pii_removed_image = image_redactor.redact(image=image, fill=(255, 0, 0))  # type: ignore
+        ocr_kwargs = (
+            {"timeout": config.OCR_TIMEOUT_SECONDS}
+            if config.OCR_TIMEOUT_SECONDS > 0
+            else None
+        )
+        if config.OCR_PREPROCESS:
+            from ocr_preprocessing import redact_image
+
+            pii_removed_image = redact_image(
+                image_redactor, image, fill=(255, 0, 0), ocr_kwargs=ocr_kwargs
+            )
+        else:
+            pii_removed_image = image_redactor.redact(  # type: ignore
+                image=image, fill=(255, 0, 0), ocr_kwargs=ocr_kwargs
+            )
 
         # Debug: Display original and redacted images
 
@@ -83,23 +166,338 @@ def remove_pii_from_image(input_file):
         return {"error": str(e)}
 
 
-def remove_pii_from_df(df):
+def _anonymize_value(value, results):
+    if not results:
+        return value
+    return (
+        anonymizer_engine()
+        .anonymize(
+            text=value,
+            analyzer_results=results,  # type: ignore
+        )
+        .text
+    )
+
+
+def _analyze_values_full(values, batched, batch_size, n_process, score_threshold):
+    if not values:
+        return []
+
+    if batched:
+        # One nlp.pipe pass over all values instead of one nlp() call per value
+        return batch_analyzer_engine().analyze_iterator(
+            texts=values,
+            language="en",
+            batch_size=batch_size,
+            n_process=n_process,
+            score_threshold=score_threshold,
+        )
+
+    return [
+        analyzer_engine().analyze(
+            text=value, language="en", score_threshold=score_threshold
+        )
+        for value in values
+    ]
+
+
+def _pattern_only_artifacts(text):
+    # Tokenizer output only, so context words still boost pattern scores but
+    # no NER entities are produced
+    nlp_engine = analyzer_engine().nlp_engine
+    doc = nlp_engine.nlp["en"].tokenizer(text)  # type: ignore
+    return NlpArtifacts(
+        entities=[],
+        tokens=doc,
+        tokens_indices=[token.idx for token in doc],
+        lemmas=[token.lower_ for token in doc],
+        nlp_engine=nlp_engine,
+        language="en",
+    )
+
+
+def _analyze_values_pattern_only(values, score_threshold=0):
+    return [
+        analyzer_engine().analyze(
+            text=value,
+            language="en",
+            score_threshold=score_threshold,
+            nlp_artifacts=_pattern_only_artifacts(value),
+        )
+        for value in values
+    ]
+
+
+# Text with no letters, or a date/time whose only letters are the ISO 8601
+# separator, a meridiem or a UTC zone: nothing NER could tag
+_LETTER = re.compile(r"[^\W\d_]")
+_TIMESTAMP = re.compile(
+    r"\d{1,4}([-/.]\d{1,2}[-/.]\d{1,4})?"
+    r"([T ]?\d{1,2}(:\d{2}){1,2}(\.\d+)?)?"
+    r" ?([AaPp][Mm])?"
+    r" ?(Z|UTC|GMT)?([+-]\d{2}:?\d{2})?"
+)
+
+_tier_counts = Counter()
+_tier_counts_lock = threading.Lock()
+
+
+def _detection_tier(text):
+    # "skipped": blank, nothing to find
+    # "pattern": numbers, codes and timestamps; only regex recognizers
+    # "ner": any other text, whatever its case
+    text = text.strip()
+    if not text:
+        return "skipped"
+    if not _LETTER.search(text) or _TIMESTAMP.fullmatch(text):
+        return "pattern"
+    return "ner"
+
+
+def detection_tier_counts():
+    with _tier_counts_lock:
+        return dict(_tier_counts)
+
+
+def _analyze_values(
+    values, batched, batch_size=1, n_process=1, score_threshold=0, tiered=None
+):
+    tiered = config.TIERED_DETECTION if tiered is None else tiered
+    if not tiered:
+        return _analyze_values_full(
+            values, batched, batch_size, n_process, score_threshold
+        )
+
+    tiers = [_detection_tier(value) for value in values]
+    with _tier_counts_lock:
+        _tier_counts.update(tiers)
+
+    results = [[] for _ in values]
+    ner_index = [i for i, tier in enumerate(tiers) if tier == "ner"]
+    pattern_index = [i for i, tier in enumerate(tiers) if tier == "pattern"]
+
+    ner_results = _analyze_values_full(
+        [values[i] for i in ner_index], batched, batch_size, n_process, score_threshold
+    )
+    pattern_results = _analyze_values_pattern_only(
+        [values[i] for i in pattern_index], score_threshold
+    )
+    for i, value_results in zip(ner_index, ner_results):
+        results[i] = value_results
+    for i, value_results in zip(pattern_index, pattern_results):
+        results[i] = value_results
+
+    return results
+
+
+def _analyze_texts(texts, score_threshold=0):
+    # Texts longer than TEXT_CHUNK_CHARS are analyzed as overlapping chunks,
+    # which bounds the size of each spaCy doc and lets TEXT_N_PROCESS
+    # processes share a long document; chunk spans are shifted back to text
+    # offsets and merged
+    from text_chunker import combine_chunk_results, split_text
+
+    chunks, owners = [], []
+    for index, text in enumerate(texts):
+        if len(text) > config.TEXT_CHUNK_CHARS:
+            for offset, chunk in split_text(
+                text, config.TEXT_CHUNK_CHARS, config.TEXT_CHUNK_OVERLAP
+            ):
+                chunks.append(chunk)
+                owners.append((index, offset))
+        else:
+            chunks.append(text)
+            owners.append((index, None))
+
+    chunk_results = _analyze_values(
+        chunks,
+        batched=True,
+        batch_size=config.DF_BATCH_SIZE,
+        n_process=config.TEXT_N_PROCESS,
+        score_threshold=score_threshold,
+    )
+
+    results = [[] for _ in texts]
+    chunked = {}
+    for (index, offset), value_results, chunk in zip(owners, chunk_results, chunks):
+        if offset is None:
+            results[index] = value_results
+        else:
+            chunked.setdefault(index, []).append((offset, len(chunk), value_results))
+    for index, parts in chunked.items():
+        results[index] = combine_chunk_results(texts[index], parts)
+
+    if chunked:
+        my_logger.info(
+            f"Analyzed {len(chunked)} long texts as "
+            f"{sum(1 for _, offset in owners if offset is not None)} chunks"
+        )
+    return results
+
+
+def _is_ner_result(result):
+    recognizer_name = result.recognition_metadata.get(
+        RecognizerResult.RECOGNIZER_NAME_KEY
+    )
+    return recognizer_name in ner_recognizer_names()
+
+
+def _profile_column(texts, batched, batch_size, n_process):
+    sample_size = min(config.PROFILE_SAMPLE_SIZE, len(texts))
+    sample_index = sorted(random.Random(0).sample(range(len(texts)), sample_size))
+    sample_results = dict(
+        zip(
+            sample_index,
+            _analyze_values(
+                [texts[i] for i in sample_index], batched, batch_size, n_process
+            ),
+        )
+    )
+
+    pii_hits = sum(1 for results in sample_results.values() if results)
+    ner_hits = sum(
+        1
+        for results in sample_results.values()
+        if any(_is_ner_result(result) for result in results)
+    )
+
+    # Upper bound on the share of unsampled values that could hold NER
+    # entities when none were seen in the sample (exact zero for a full sample)
+    if sample_size == len(texts):
+        miss_bound = 0.0
+    else:
+        miss_bound = 1 - (1 - config.PROFILE_CONFIDENCE) ** (1 / sample_size)
+    bound_text = (
+        f"miss rate <= {miss_bound:.2%} at {config.PROFILE_CONFIDENCE:.0%} confidence"
+    )
+
+    if ner_hits:
+        action = "full"
+        reason = f"{ner_hits}/{sample_size} sampled values had NER entities"
+    elif miss_bound > config.PROFILE_MAX_MISS_RATE:
+        action = "full"
+        reason = f"sample of {sample_size} too small, {bound_text}"
+    else:
+        # Never below regex: values the sample missed still get a pattern scan
+        action = "regex"
+        reason = (
+            f"no NER entities in {sample_size} sampled values ({pii_hits} with "
+            f"pattern entities), {bound_text}; pattern scan only"
+        )
+
+    profile = {
+        "action": action,
+        "reason": reason,
+        "sample_size": sample_size,
+        "sample_pii_rate": pii_hits / sample_size,
+    }
+    return profile, sample_results
+
+
+def _remove_pii_from_column(
+    anonymized_df, position, batched, dedupe, profile, batch_size, n_process
+):
+    # By position, labels repeat in tables with blank header cells
+    import pandas as pd
+
+    series = anonymized_df.iloc[:, position]
+    mask = series.map(lambda value: isinstance(value, str))
+    values = series[mask]
+
+    stats = {"rows": len(values), "distinct": 0, "analysis_calls": 0}
+
+    if values.empty:
+        return stats
+
+    if dedupe:
+        codes, uniques = pd.factorize(values)
+        texts = uniques.tolist()
+    else:
+        codes = None
+        texts = values.tolist()
+
+    if profile:
+        column_profile, results_by_index = _profile_column(
+            texts, batched, batch_size, n_process
+        )
+        stats.update(column_profile)
+        action = column_profile["action"]
+    else:
+        results_by_index = {}
+        action = "full"
+
+    remaining = [i for i in range(len(texts)) if i not in results_by_index]
+    stats["analysis_calls"] = len(results_by_index)
+    if action == "full":
+        remaining_results = _analyze_values(
+            [texts[i] for i in remaining], batched, batch_size, n_process
+        )
+        stats["analysis_calls"] += len(remaining)
+    else:
+        remaining_results = _analyze_values_pattern_only([texts[i] for i in remaining])
+    results_by_index.update(zip(remaining, remaining_results))
+
+    anonymized = [
+        _anonymize_value(value, results_by_index[i]) for i, value in enumerate(texts)
+    ]
+
+    if codes is not None:
+        anonymized = pd.Series(anonymized, dtype=object).take(codes).to_numpy()
+
+    anonymized_df.iloc[mask.to_numpy(), position] = anonymized
+
+    stats["distinct"] = values.nunique() if codes is None else len(texts)
+    return stats
+
+
+def remove_pii_from_df(
+    df,
+    batched=None,
+    dedupe=None,
+    profile=None,
+    batch_size=None,
+    n_process=None,
+    report=None,
+):
+    batched = config.DF_BATCHED if batched is None else batched
+    dedupe = config.DF_DEDUPE if dedupe is None else dedupe
+    profile = config.DF_PROFILE if profile is None else profile
+    batch_size = batch_size or config.DF_BATCH_SIZE
+    n_process = n_process or config.DF_N_PROCESS
+
     try:
+        tiers_before = detection_tier_counts()
         anonymized_df = df.copy()
-        for column in anonymized_df.select_dtypes(include=["object"]).columns:
-            for index, value in anonymized_df[column].items():
-                if isinstance(value, str):
-                    results = analyzer_engine().analyze(
-                        text=value,
-                        language="en",
-                        score_threshold=0,
-                    )
-                    if results:
-                        anonymized_value = anonymizer_engine().anonymize(
-                            text=value,
-                            analyzer_results=results,  # type: ignore
-                        )
-                        anonymized_df.at[index, column] = anonymized_value.text
+        for position, (column, dtype) in enumerate(anonymized_df.dtypes.items()):
+            if dtype != object:
+                continue
+            stats = _remove_pii_from_column(
+                anonymized_df, position, batched, dedupe, profile, batch_size, n_process
+            )
+
+            rows = stats["rows"]
+            stats["cardinality_ratio"] = stats["distinct"] / rows if rows else 0.0
+            stats["calls_saved"] = rows - stats["analysis_calls"]
+            my_logger.info(
+                f"Column {column!r}: {rows} values, {stats['distinct']} distinct "
+                f"(ratio {stats['cardinality_ratio']:.2f}), "
+                f"{stats['calls_saved']} analysis calls saved"
+                + (
+                    f", {stats['action']}: {stats['reason']}"
+                    if "action" in stats
+                    else ""
+                )
+            )
+            if report is not None:
+                report[column if column not in report else (column, position)] = stats
+
+        tiers = Counter(detection_tier_counts())
+        tiers.subtract(tiers_before)
+        if tiers.total():
+            my_logger.info(
+                f"Detection tiers: {tiers['ner']} NER, {tiers['pattern']} "
+                f"pattern-only, {tiers['skipped']} skipped"
+            )
 
         # Debug: Display original DataFrame and anonymized DataFrame
 
@@ -1,24 +1,331 @@
-import pandas as pd
+import hashlib
 import json
 import io
-from PIL import Image
+import threading
+import time
 
+import config
+import result_cache
+from analysis_backend import get_backend
 from helpers import (
     my_logger,
+    image_dhash,
     extract_content_from_pptx,
     extract_content_from_pdf,
+    iter_excel_chunks,
+    iter_pdf_pages,
+    prefetch,
 )
-from pii_remover import remove_pii_from_image, remove_pii_from_df, remove_pii_from_text
-from gemini_data_analyzer import (
-    analyze_image_with_gemini,
-    analyze_dataframe_with_gemini,
-    analyze_embedded_image_with_gemini,
-    analyze_pdf_with_gemini,
-    analyze_ppt_with_gemini,
-)
+from image_payload import encode_payload
+from sheet_summary import SheetSummary
+
+# Format specific dependencies (PIL, pandas, presidio, python-pptx, PyPDF2,
+# google-genai) are imported inside their branch so they load on first use
+
+# Bump when a change to the processing steps should invalidate cached results
+PIPELINE_VERSION = 5
+
+# Highest mean grayscale difference (0-255) of two near copies' thumbnails
+IMAGE_DEDUPE_MAX_PIXEL_DIFF = 2
+
+
+def _thumbnails_match(thumbnail, other):
+    # Mean absolute difference of the grayscale thumbnails, which rules out
+    # hash collisions between visibly different images
+    difference = sum(abs(a - b) for a, b in zip(thumbnail, other))
+    return difference <= IMAGE_DEDUPE_MAX_PIXEL_DIFF * len(thumbnail)
+
+
+def _unique_images(image_blobs, order):
+    # Yields the images that are not a copy of an earlier one, exact copies
+    # by sha256 and, with IMAGE_DEDUPE_MAX_DISTANCE set, near copies
+    # (re-encoded, resized) by difference hash and thumbnail;
+    # order gets, per input image, the position of the unique image it uses
+    exact = {}
+    perceptual = []
+    unique = 0
+
+    for data in image_blobs:
+        if not config.IMAGE_DEDUPE:
+            order.append(len(order))
+            yield data
+            continue
+
+        digest = hashlib.sha256(data).digest()
+        if digest in exact:
+            order.append(exact[digest])
+            continue
+
+        dhash = None
+        if config.IMAGE_DEDUPE_MAX_DISTANCE >= 0:
+            try:
+                dhash, aspect, thumbnail = image_dhash(data)
+            except Exception:
+                pass
+
+        if dhash is not None:
+            match = next(
+                (
+                    position
+                    for other, other_aspect, other_thumbnail, position in perceptual
+                    if (dhash ^ other).bit_count() <= config.IMAGE_DEDUPE_MAX_DISTANCE
+                    and abs(aspect - other_aspect) <= 0.05 * other_aspect
+                    and _thumbnails_match(thumbnail, other_thumbnail)
+                ),
+                None,
+            )
+            if match is not None:
+                exact[digest] = match
+                order.append(match)
+                continue
+
+        exact[digest] = unique
+        if dhash is not None:
+            perceptual.append((dhash, aspect, thumbnail, unique))
+        order.append(unique)
+        unique += 1
+        yield data
+
+
+def _redacted_images(image_blobs):
+    # Yields (index, redacted PIL image or the exception that prevented it)
+    from PIL import Image
+    from pii_remover import remove_pii_from_image
+
+    if config.OCR_WORKERS > 1:
+        from redaction_pool import redact_in_pool
+
+        yield from redact_in_pool(image_blobs)
+        return
+
+    for index, data in enumerate(image_blobs):
+        try:
+            pii_removed_image = remove_pii_from_image(Image.open(io.BytesIO(data)))
+            if isinstance(pii_removed_image, dict):
+                raise ValueError(pii_removed_image["error"])
+            yield index, pii_removed_image
+        except Exception as e:
+            my_logger.error(f"Error removing PII from embedded image {index}: {e}")
+            yield index, e
+
+
+def _failed_future(error):
+    from concurrent.futures import Future
+
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+def _submit_per_image(submit, redacted):
+    backend = get_backend()
+
+    futures, requests = [], 0
+    for _, image in redacted:
+        if isinstance(image, Exception):
+            futures.append((_failed_future(image), None))
+        else:
+            futures.append((submit(backend.analyze_embedded_image, image), None))
+            requests += 1
+    return futures, requests
+
+
+def _submit_batched(submit, redacted):
+    # Packs redacted images into requests of at most GEMINI_IMAGES_PER_REQUEST
+    # images and GEMINI_MAX_REQUEST_BYTES of image data
+    backend = get_backend()
+
+    futures, requests = [], 0
+    batch, batch_slots, batch_bytes = [], [], 0
+
+    def _flush():
+        nonlocal requests
+        if batch:
+            requests += 1
+            batch_future = submit(backend.analyze_embedded_image_batch, list(batch))
+            for position, slot in enumerate(batch_slots):
+                futures[slot] = (batch_future, position)
+            batch.clear()
+            batch_slots.clear()
+
+    for _, image in redacted:
+        if isinstance(image, Exception):
+            futures.append((_failed_future(image), None))
+            continue
+
+        payload = encode_payload(image)
+        if batch and (
+            len(batch) >= config.GEMINI_IMAGES_PER_REQUEST
+            or batch_bytes + len(payload[0]) > config.GEMINI_MAX_REQUEST_BYTES
+        ):
+            _flush()
+            batch_bytes = 0
+        futures.append(None)
+        batch.append(payload)
+        batch_slots.append(len(futures) - 1)
+        batch_bytes += len(payload[0])
+    _flush()
+
+    return futures, requests
+
+
+def analyze_embedded_images(image_blobs) -> list:
+    # Redaction runs here one image at a time while the analysis calls for the
+    # already redacted ones run on a bounded pool; results keep image order and
+    # a failing image only records an error for itself. Copies of an image
+    # reuse the result of its first occurrence
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    start = time.perf_counter()
+    batched = config.GEMINI_BATCH_IMAGES
+    order = []
+
+    # Redaction pauses while this many analysis calls are queued or running,
+    # so at most that many redacted images are held in memory
+    workers = max(1, config.GEMINI_MAX_CONCURRENCY)
+    slots = threading.BoundedSemaphore(2 * workers)
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="analysis-image"
+    ) as executor:
+
+        def submit(fn, *args):
+            slots.acquire()
+            future = executor.submit(fn, *args)
+            future.add_done_callback(lambda _: slots.release())
+            return future
+
+        redacted = _redacted_images(_unique_images(image_blobs, order))
+        submit_all = _submit_batched if batched else _submit_per_image
+        futures, requests = submit_all(submit, redacted)
+
+    unique_analysis = []
+    for index, (future, position) in enumerate(futures):
+        try:
+            result = future.result()
+            unique_analysis.append(result if position is None else result[position])
+        except Exception as e:
+            my_logger.error(f"Error analyzing embedded image {index}: {e}")
+            unique_analysis.append(json.dumps({"error": str(e)}))
+
+    image_analysis = [unique_analysis[position] for position in order]
+
+    if image_analysis:
+        my_logger.info(
+            f"Analyzed {len(image_analysis)} embedded images "
+            f"({len(image_analysis) - len(unique_analysis)} duplicates removed) "
+            f"with {requests} analysis requests "
+            f"({'batched' if batched else 'per image'}) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+    return image_analysis
+
+
+def stream_pdf(input_file):
+    # Pages are extracted on a background thread at most PDF_PREFETCH_PAGES
+    # ahead; each page's text is sanitized as soon as it arrives and its
+    # images go straight on to analyze_embedded_images, so only the sanitized
+    # text outlives its page. Returns (sanitized page texts, image analysis)
+    from pii_remover import remove_pii_from_text
+
+    start = time.perf_counter()
+    sanitized_text = []
+    pages = 0
+
+    def _page_images():
+        nonlocal pages
+        for page_number, text, images in prefetch(
+            iter_pdf_pages(input_file), config.PDF_PREFETCH_PAGES
+        ):
+            pages += 1
+            if text:
+                sanitized = remove_pii_from_text(text)
+                if isinstance(sanitized, dict):
+                    raise ValueError(f"Page {page_number}: {sanitized['error']}")
+                sanitized_text.append(sanitized)
+            yield from images
+
+    image_analysis = analyze_embedded_images(_page_images())
+    my_logger.info(f"Streamed {pages} PDF pages in {time.perf_counter() - start:.1f}s")
+    return sanitized_text, image_analysis
+
+
+# Parts of the file processed on this thread that failed (an embedded image
+# analysis, a table) while the file as a whole still got a result
+_partial_failures = threading.local()
+
+
+def _has_error(value):
+    # An {"error": ...} anywhere in the value, also inside JSON strings such
+    # as the per-image analyses
+    if isinstance(value, dict):
+        return "error" in value or any(_has_error(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_error(v) for v in value)
+    if isinstance(value, str) and value.lstrip().startswith("{"):
+        try:
+            return _has_error(json.loads(value))
+        except ValueError:
+            return False
+    return False
+
+
+def _note_partial_failures(items):
+    failed = sum(1 for item in items if _has_error(item))
+    _partial_failures.count = getattr(_partial_failures, "count", 0) + failed
 
 
 def get_set_go(input_file) -> dict:
+    cache_key = None
+    if config.CACHE_ENABLED:
+        try:
+            cache_key = result_cache.file_key(input_file, PIPELINE_VERSION)
+        except Exception as e:
+            my_logger.warning(f"Could not hash {input_file.name} for caching: {e}")
+
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            my_logger.info(f"Result cache hit for {input_file.name}")
+            return cached
+
+    try:
+        # The counters are per process, so files processed concurrently share them
+        limiter = get_backend().limiter
+    except Exception as e:
+        my_logger.error(f"No analysis backend for {input_file.name}: {e}")
+        return {"error": str(e)}
+    before = dict(limiter.stats)
+    _partial_failures.count = 0
+    result = process_file(input_file)
+    delta = {k: v - before[k] for k, v in limiter.stats.items()}
+    if delta["calls"]:
+        my_logger.info(
+            f"Sent {delta['bytes_sent'] / 1024:.0f} KB to the analysis backend "
+            f"for {input_file.name} in {delta['calls']} calls"
+        )
+    if delta["retries"] or delta["throttled_seconds"] or delta["rejected"]:
+        my_logger.info(
+            f"Analysis calls for {input_file.name}: {delta['calls']} calls, "
+            f"{delta['retries']} retries, {delta['rejected']} rejected by the "
+            f"circuit breaker, {delta['throttled_seconds']:.1f}s throttled"
+        )
+
+    if cache_key and result and not _has_error(result):
+        # A result missing failed parts would otherwise be served from the
+        # cache after the failure (a timeout, a rate limit) has cleared
+        if _partial_failures.count:
+            my_logger.info(
+                f"Not caching the result for {input_file.name}: "
+                f"{_partial_failures.count} failed parts"
+            )
+        else:
+            result_cache.put(cache_key, result)
+
+    return result
+
+
+def process_file(input_file) -> dict:
 
     try:
 
@@ -31,10 +338,11 @@ def get_set_go(input_file) -> dict:
         if file_type in ["image/png", "image/jpg", "image/jpeg"]:
 
             try:
+                from pii_remover import remove_pii_from_image
 
                 pii_removed_image = remove_pii_from_image(input_file)
 
-                analyzed_text_json = analyze_image_with_gemini(pii_removed_image)
+                analyzed_text_json = get_backend().analyze_image(pii_removed_image)
 
                 return json.loads(analyzed_text_json)  # type: ignore
             except Exception as e:
@@ -46,11 +354,29 @@ def get_set_go(input_file) -> dict:
             == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         ):
             try:
-                df = pd.read_excel(input_file)
+                from pii_remover import remove_pii_from_df
 
-                anonymized_df = remove_pii_from_df(df.copy())
+                chunks = prefetch(
+                    iter_excel_chunks(input_file, config.XLSX_CHUNK_ROWS),
+                    config.XLSX_PREFETCH_CHUNKS,
+                )
 
-                analyzed_text_json = analyze_dataframe_with_gemini(anonymized_df)
+                # Only a fixed-size summary (or the first rows) of each sheet
+                # is kept for the prompt, everything else is released as soon
+                # as it is sanitized
+                sheet_previews = {}
+                for sheet_name, df in chunks:
+                    anonymized_df = remove_pii_from_df(df)
+                    if isinstance(anonymized_df, dict):
+                        return anonymized_df
+                    if config.SHEET_SUMMARY:
+                        if sheet_name not in sheet_previews:
+                            sheet_previews[sheet_name] = SheetSummary()
+                        sheet_previews[sheet_name].update(anonymized_df)
+                    elif sheet_name not in sheet_previews:
+                        sheet_previews[sheet_name] = anonymized_df.head()
+
+                analyzed_text_json = get_backend().analyze_dataframe(sheet_previews)
 
                 # my_logger.info(f"Excel DataFrame:\n{df.head()}")
 
@@ -65,11 +391,22 @@ def get_set_go(input_file) -> dict:
             == "application/vnd.openxmlformats-officedocument.presentationml.presentation"
         ):
             try:
+                import pandas as pd
+                from pii_remover import (
+                    remove_pii_from_df,
+                    remove_pii_from_text,
+                    remove_pii_from_texts,
+                )
+
                 extracted_content_from_pptx = extract_content_from_pptx(input_file)
 
                 text = extracted_content_from_pptx["text"]
-                sanitized_text = []
-                if text:
+                if config.TEXT_COALESCE:
+                    sanitized_text = remove_pii_from_texts(text)
+                    if isinstance(sanitized_text, dict):
+                        return sanitized_text
+                else:
+                    sanitized_text = []
                     for texts in text:
                         sanitized_text.append(remove_pii_from_text(texts))
 
@@ -82,36 +419,15 @@ def get_set_go(input_file) -> dict:
                         anonymized_df.append(anonymized_table)
 
                 images = extracted_content_from_pptx["images"]
-                image_analysis_by_ai = []
-                try:
-                    if images:
-                        for image in images:
-                            data = image[0]
-                            image = Image.open(io.BytesIO(data))
-                            try:
-                                pii_removed_image = remove_pii_from_image(image)
-                            except Exception as e:
-                                my_logger.error(f"Error removing PII from image: {e}")
-                                return {"error": str(e)}
-                            try:
-                                image_analysis_result = (
-                                    analyze_embedded_image_with_gemini(
-                                        pii_removed_image
-                                    )
-                                )
-                                image_analysis_by_ai.append(image_analysis_result)
-                            except Exception as e:
-                                my_logger.error(
-                                    f"Error analyzing image with Gemini: {e}"
-                                )
-                                return {"error": str(e)}
-
-                except Exception as e:
-                    my_logger.error(
-                        f"Error processing images in PPTX file {input_file}: {e}"
-                    )
-
-                analyzed_text_json = analyze_ppt_with_gemini(
+                image_analysis_by_ai = analyze_embedded_images(
+                    image[0] for image in images
+                )
+
+                _note_partial_failures(sanitized_text)
+                _note_partial_failures(anonymized_df)
+                _note_partial_failures(image_analysis_by_ai)
+
+                analyzed_text_json = get_backend().analyze_ppt(
                     sanitized_text, anonymized_df, image_analysis_by_ai
                 )
 
@@ -123,27 +439,30 @@ def get_set_go(input_file) -> dict:
 
         elif file_type == "application/pdf":
             try:
-
-                extracted_content_from_pdf = extract_content_from_pdf(input_file)
-
-                text = extracted_content_from_pdf["text"]
-                sanitized_text = []
-                if text:
-                    for texts in text:
-                        sanitized_text.append(remove_pii_from_text(texts))
-
-                images = extracted_content_from_pdf["images"]
-                image_analysis_by_ai = []
-                if images:
-                    for image in images:
-                        image = Image.open(io.BytesIO(image))
-                        pii_removed_image = remove_pii_from_image(image)
-                        image_analysis_result = analyze_embedded_image_with_gemini(
-                            pii_removed_image
-                        )
-                        image_analysis_by_ai.append(image_analysis_result)
-
-                analyzed_text_json = analyze_pdf_with_gemini(
+                from pii_remover import remove_pii_from_text, remove_pii_from_texts
+
+                if config.PDF_STREAMING:
+                    sanitized_text, image_analysis_by_ai = stream_pdf(input_file)
+                else:
+                    extracted_content_from_pdf = extract_content_from_pdf(input_file)
+
+                    text = extracted_content_from_pdf["text"]
+                    if config.TEXT_COALESCE:
+                        sanitized_text = remove_pii_from_texts(text)
+                        if isinstance(sanitized_text, dict):
+                            return sanitized_text
+                    else:
+                        sanitized_text = []
+                        for texts in text:
+                            sanitized_text.append(remove_pii_from_text(texts))
+
+                    images = extracted_content_from_pdf["images"]
+                    image_analysis_by_ai = analyze_embedded_images(images)
+
+                _note_partial_failures(sanitized_text)
+                _note_partial_failures(image_analysis_by_ai)
+
+                analyzed_text_json = get_backend().analyze_pdf(
                     sanitized_text, image_analysis_by_ai
                 )
 
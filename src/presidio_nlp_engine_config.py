@@ -1,25 +1,80 @@
 import logging
 import os
-from typing import Tuple
+from typing import List, Optional, Tuple
 
+import spacy
 from presidio_analyzer import RecognizerRegistry
 from presidio_analyzer.nlp_engine import (
+    NerModelConfiguration,
+    NlpArtifacts,
     NlpEngine,
-    NlpEngineProvider,
+    SpacyNlpEngine,
+)
+
+import config
+from combined_pattern_recognizer import (
+    CombinedPatternRecognizer,
+    load_pattern_recognizers,
 )
 
 logger = logging.getLogger("presidio-streamlit")
 
 
-def create_nlp_engine_with_spacy() -> Tuple[NlpEngine, RecognizerRegistry]:
-    # def create_nlp_engine_with_spacy() -> NlpEngine:
+class TrimmedSpacyNlpEngine(SpacyNlpEngine):
+    """
+    SpacyNlpEngine that leaves out pipeline components Presidio does not use
+    :param exclude: spaCy component names not to load (e.g. parser, lemmatizer).
+    """
+
+    def __init__(self, models=None, ner_model_configuration=None, exclude=None):
+        super().__init__(models=models, ner_model_configuration=ner_model_configuration)
+        self.exclude = list(exclude or [])
+
+    def load(self) -> None:
+        # As SpacyNlpEngine.load, with exclude passed to spacy.load
+        self._enable_gpu()
+        self.nlp = {}
+        for model in self.models:
+            self._validate_model_params(model)
+            self._download_spacy_model_if_needed(model["model_name"])
+            self.nlp[model["lang_code"]] = spacy.load(
+                model["model_name"], exclude=self.exclude
+            )
+            logger.info(
+                f"Loaded spaCy model {model['model_name']} with components "
+                f"{self.nlp[model['lang_code']].pipe_names}"
+            )
+
+    def _doc_to_nlp_artifact(self, doc, language):
+        nlp_artifacts = super()._doc_to_nlp_artifact(doc, language)
+        if all(nlp_artifacts.lemmas):
+            return nlp_artifacts
+        # Without the lemmatizer, context words are matched on lowercase
+        # tokens; keywords were built from the empty lemmas and context
+        # enhancement reads them, so they are rebuilt too
+        nlp_artifacts.lemmas = [
+            lemma or token.lower_ for lemma, token in zip(nlp_artifacts.lemmas, doc)
+        ]
+        nlp_artifacts.keywords = NlpArtifacts.set_keywords(
+            self, nlp_artifacts.lemmas, language
+        )
+        return nlp_artifacts
+
+
+def create_nlp_engine_with_spacy(
+    model_name: Optional[str] = None, exclude: Optional[List[str]] = None
+) -> Tuple[NlpEngine, RecognizerRegistry]:
     """
-    Instantiate an NlpEngine with a spaCy model
-    :param model_path: path to model / model name.
+    Instantiate an NlpEngine with a trimmed spaCy pipeline
+    :param model_name: spaCy model name / path, defaults to config.SPACY_MODEL.
+    :param exclude: components not to load, defaults to config.SPACY_EXCLUDE.
     """
+    model_name = model_name or config.SPACY_MODEL
+    exclude = config.SPACY_EXCLUDE if exclude is None else exclude
+
     nlp_configuration = {
         "nlp_engine_name": "spacy",
-        "models": [{"lang_code": "en", "model_name": "en_core_web_lg"}],
+        "models": [{"lang_code": "en", "model_name": model_name}],
         "ner_model_configuration": {
             "model_to_presidio_entity_mapping": {
                 "PER": "PERSON",
@@ -51,13 +106,25 @@ def create_nlp_engine_with_spacy() -> Tuple[NlpEngine, RecognizerRegistry]:
         },
     }
 
-    nlp_engine = NlpEngineProvider(nlp_configuration=nlp_configuration).create_engine()
+    nlp_engine = TrimmedSpacyNlpEngine(
+        models=nlp_configuration["models"],
+        ner_model_configuration=NerModelConfiguration.from_dict(
+            nlp_configuration["ner_model_configuration"]
+        ),
+        exclude=exclude,
+    )
+    nlp_engine.load()
 
     registry = RecognizerRegistry()
 
-    base_dir = os.path.dirname(__file__)
-    registry.add_recognizers_from_yaml(os.path.join(base_dir, "patterns", "emp.yaml"))
-    registry.add_recognizers_from_yaml(os.path.join(base_dir, "patterns", "token.yaml"))
+    custom_recognizers = load_pattern_recognizers(
+        os.path.join(os.path.dirname(__file__), "patterns")
+    )
+    if config.COMBINED_CUSTOM_PATTERNS and custom_recognizers:
+        registry.add_recognizer(CombinedPatternRecognizer(custom_recognizers))
+    else:
+        for recognizer in custom_recognizers:
+            registry.add_recognizer(recognizer)
 
     registry.load_predefined_recognizers(nlp_engine=nlp_engine)
 
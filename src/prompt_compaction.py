@@ -0,0 +1,198 @@
+import json
+import re
+
+import config
+from helpers import my_logger
+
+_SPACES = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+# Same estimate the Gemini limiter uses for text
+CHARS_PER_TOKEN = 4
+
+
+def normalize_whitespace(text):
+    # Runs of spaces become one space and blank lines are dropped
+    text = _SPACES.sub(" ", str(text))
+    text = _BLANK_LINES.sub("\n", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def compact_paragraphs(paragraphs):
+    # Normalized, without empty paragraphs or a paragraph repeating the one
+    # before it (text split across runs, repeated titles)
+    compacted = []
+    for paragraph in paragraphs:
+        if not isinstance(paragraph, str):
+            continue
+        paragraph = normalize_whitespace(paragraph)
+        if paragraph and (not compacted or compacted[-1] != paragraph):
+            compacted.append(paragraph)
+    return compacted
+
+
+def _markdown_cell(value):
+    return normalize_whitespace(value).replace("\n", " ").replace("|", "\\|")
+
+
+def render_table(df, table_format=None):
+    """
+    Render an anonymized table compactly, as CSV or a markdown table.
+    Anything that is not a DataFrame (an {"error": ...} from anonymization)
+    renders as an empty string.
+    """
+    import pandas as pd
+
+    table_format = table_format or config.PROMPT_TABLE_FORMAT
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return ""
+
+    df = df.fillna("")
+    df = df[(df.astype(str) != "").any(axis=1)]
+    if table_format == "markdown":
+        rows = [[_markdown_cell(c) for c in df.columns]]
+        rows += [[_markdown_cell(v) for v in row] for row in df.itertuples(index=False)]
+        lines = ["| " + " | ".join(row) + " |" for row in rows]
+        lines.insert(1, "|" + "---|" * len(df.columns))
+        return "\n".join(lines)
+    return normalize_whitespace(df.to_csv(index=False, lineterminator="\n"))
+
+
+def compact_image_analysis(analysis):
+    # Image analyses that failed carry no information for the prompt
+    try:
+        parsed = json.loads(analysis)
+        if isinstance(parsed, dict) and "error" in parsed:
+            return ""
+        analysis = json.dumps(parsed, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        pass
+    return normalize_whitespace(analysis).replace("\n", " ")
+
+
+def _truncate(items, max_chars):
+    # Whole items while they fit, then what is left of the next one and a
+    # note of how many were left out
+    kept, used = [], 0
+    for number, item in enumerate(items):
+        if used + len(item) + 1 <= max_chars:
+            kept.append(item)
+            used += len(item) + 1
+            continue
+        room = max_chars - used - 1
+        if room > 80:
+            # Cut at a line (table row, page line) or else a word boundary
+            cut = item[:room]
+            cut = cut.rsplit("\n", 1)[0] if "\n" in cut else cut.rsplit(" ", 1)[0]
+            kept.append(cut + " ...")
+        omitted = len(items) - number - (1 if room > 80 else 0)
+        if omitted:
+            kept.append(f"[{omitted} more omitted]")
+        break
+    return kept
+
+
+def fit_sections(sections, max_chars):
+    """
+    Shrink (title, items) sections to max_chars in total: sections under an
+    equal share keep everything and the rest is split evenly between the
+    larger ones, which are truncated to their share.
+    """
+    sizes = [sum(len(item) + 1 for item in items) for _, items in sections]
+    if not max_chars or sum(sizes) <= max_chars:
+        return sections
+
+    shares = [0] * len(sections)
+    remaining = max_chars
+    by_size = sorted(range(len(sections)), key=lambda i: sizes[i])
+    for position, index in enumerate(by_size):
+        shares[index] = min(sizes[index], remaining // (len(sections) - position))
+        remaining -= shares[index]
+
+    return [
+        (title, _truncate(items, share))
+        for (title, items), share in zip(sections, shares)
+    ]
+
+
+def build_prompt(kind, sections):
+    """
+    Prompt content for a document: the non-empty sections, each a title
+    followed by one item per line, fitted to PROMPT_MAX_TOKENS.
+    :param sections: (title, items) pairs; items are already compacted.
+    """
+    sections = fit_sections(
+        [(title, items) for title, items in sections if items],
+        config.PROMPT_MAX_TOKENS * CHARS_PER_TOKEN,
+    )
+    content = f"The following was found in the {kind} file."
+    for title, items in sections:
+        content += f"\n{title}:\n" + "\n".join(items)
+    return content
+
+
+def _image_items(images):
+    items = []
+    for number, analysis in enumerate(images, start=1):
+        analysis = compact_image_analysis(analysis)
+        if analysis:
+            items.append(f"Image {number}: {analysis}")
+    return items
+
+
+def _list_size(items):
+    # Length of str(items) for a list of strings: each item quoted and
+    # separated by ", ", escapes aside
+    return 2 + sum(
+        (len(item) + 4) if isinstance(item, str) else len(str(item)) + 2
+        for item in items
+    )
+
+
+def _report(kind, before, content, report):
+    my_logger.info(
+        f"{kind.upper()} prompt compacted from {before} to {len(content)} "
+        f"characters (~{len(content) // CHARS_PER_TOKEN} tokens)"
+    )
+    if report is not None:
+        report.update(before_chars=before, after_chars=len(content))
+
+
+def compact_ppt(text, tables, images, report=None):
+    # before estimates the size of the prompt content as it was built
+    # uncompacted, from its parts (tables by their rendered size) rather
+    # than by building it
+    rendered = [render_table(table) for table in tables]
+    before = (
+        _list_size(text)
+        + sum(len(table) + 2 for table in rendered)
+        + _list_size(images)
+        + 40
+    )
+    content = build_prompt(
+        "pptx",
+        [
+            ("Text", compact_paragraphs(text)),
+            (
+                "Tables",
+                [
+                    f"Table {number}:\n{table}"
+                    for number, table in enumerate(rendered, start=1)
+                    if table
+                ],
+            ),
+            ("Images", _image_items(images)),
+        ],
+    )
+    _report("pptx", before, content, report)
+    return content
+
+
+def compact_pdf(text, images, report=None):
+    before = _list_size(text) + _list_size(images) + 40
+    content = build_prompt(
+        "pdf",
+        [("Pages", compact_paragraphs(text)), ("Images", _image_items(images))],
+    )
+    _report("pdf", before, content, report)
+    return content
@@ -0,0 +1,211 @@
+import io
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+
+import config
+from helpers import encode_png, my_logger
+
+_pool = None
+_pool_lock = threading.Lock()
+# Per pool: "started", the queue on which its workers report the pid that
+# runs each task; "pids" read from it; "running", task id -> future of tasks
+# not done yet; "stuck", ids of tasks that timed out
+_pools = {}
+_task_ids = itertools.count()
+_worker_started = None
+
+
+def _warm_worker(started):
+    # Runs once in every worker process so the first image does not pay for
+    # loading the OCR and NLP engines
+    global _worker_started
+    from pii_remover import image_redactor_engine
+
+    _worker_started = started
+    image_redactor_engine()
+
+
+def _redact_bytes(task_id, data):
+    from PIL import Image
+    from pii_remover import remove_pii_from_image
+
+    _worker_started.put((task_id, os.getpid()))
+    redacted = remove_pii_from_image(Image.open(io.BytesIO(data)))
+    if isinstance(redacted, dict):
+        raise ValueError(redacted["error"])
+    return encode_png(redacted)
+
+
+def redaction_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the parent runs Streamlit and engine threads, which do
+            # not survive a fork safely
+            context = multiprocessing.get_context("spawn")
+            started = context.SimpleQueue()
+            _pool = ProcessPoolExecutor(
+                max_workers=config.OCR_WORKERS,
+                mp_context=context,
+                initializer=_warm_worker,
+                initargs=(started,),
+            )
+            _pools[_pool] = {
+                "started": started,
+                "pids": {},
+                "running": {},
+                "stuck": set(),
+            }
+        return _pool
+
+
+def _read_started(state):
+    # Called with _pool_lock held; only pids of tasks still running are kept
+    while not state["started"].empty():
+        task_id, pid = state["started"].get()
+        if task_id in state["running"]:
+            state["pids"][task_id] = pid
+
+
+def _submit(pool, data):
+    state = _pools[pool]
+    task_id = next(_task_ids)
+    future = pool.submit(_redact_bytes, task_id, data)
+    with _pool_lock:
+        state["running"][task_id] = future
+
+    def _done(_):
+        with _pool_lock:
+            _read_started(state)
+            state["running"].pop(task_id, None)
+            state["pids"].pop(task_id, None)
+
+    # Registered first, so a task that is already done is removed at once
+    future.add_done_callback(_done)
+    return pool, task_id, future
+
+
+def _retire_pool(pool, task_id):
+    # A task stuck past the timeout keeps its worker busy. New images go to
+    # a fresh pool, while the old one finishes everything already submitted
+    # to it (from any file) before its stuck workers are killed
+    global _pool
+
+    with _pool_lock:
+        state = _pools[pool]
+        state["stuck"].add(task_id)
+        if _pool is not pool:
+            # Already retired, its reaper sees the new stuck task
+            return
+        _pool = None
+    pool.shutdown(wait=False)
+    threading.Thread(
+        target=_reap, args=(pool,), name="redaction-reaper", daemon=True
+    ).start()
+
+
+def _reap(pool):
+    state = _pools[pool]
+    while True:
+        with _pool_lock:
+            others = [
+                future
+                for task_id, future in state["running"].items()
+                if task_id not in state["stuck"] and not future.done()
+            ]
+        if not others:
+            break
+        wait(others)
+
+    with _pool_lock:
+        _read_started(state)
+        pids = [state["pids"].get(task_id) for task_id in state["stuck"]]
+    for pid in pids:
+        if pid is not None:
+            my_logger.warning(f"Killing redaction worker {pid}, stuck on an image")
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+    with _pool_lock:
+        _pools.pop(pool, None)
+
+
+def redact_in_pool(image_blobs):
+    """
+    Redact images on the process pool, keeping at most two per worker in
+    flight. Yields (index, redacted PIL image or the exception that
+    prevented it) in input order.
+    """
+    from PIL import Image
+
+    window = 2 * config.OCR_WORKERS
+    # Tesseract is given OCR_TIMEOUT_SECONDS itself, this is the backstop for
+    # everything around it
+    timeout = (
+        config.OCR_TIMEOUT_SECONDS * 2 + 30 if config.OCR_TIMEOUT_SECONDS > 0 else None
+    )
+    pending = deque()
+
+    def _try_submit(data):
+        # Once more when the pool was retired by another file meanwhile
+        for attempt in range(2):
+            pool = redaction_pool()
+            try:
+                return _submit(pool, data)
+            except Exception as e:
+                if attempt or not _replaced(pool):
+                    # The pool broke (a worker died), the next image gets a
+                    # new one
+                    _drop_broken_pool(pool)
+                    return None, None, _failed(e)
+
+    def _collect():
+        index, (pool, task_id, future) = pending.popleft()
+        try:
+            return index, Image.open(io.BytesIO(future.result(timeout=timeout)))
+        except FutureTimeoutError:
+            my_logger.error(f"Redacting embedded image {index} timed out")
+            _retire_pool(pool, task_id)
+            return index, TimeoutError(f"Redaction timed out after {timeout}s")
+        except Exception as e:
+            my_logger.error(f"Error removing PII from embedded image {index}: {e}")
+            return index, e
+
+    for index, data in enumerate(image_blobs):
+        pending.append((index, _try_submit(data)))
+        while len(pending) >= window:
+            yield _collect()
+
+    while pending:
+        yield _collect()
+
+
+def _replaced(pool):
+    with _pool_lock:
+        return _pool is not pool
+
+
+def _drop_broken_pool(pool):
+    global _pool
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _failed(error):
+    from concurrent.futures import Future
+
+    future = Future()
+    future.set_exception(error)
+    return future
@@ -0,0 +1,231 @@
+import random
+import threading
+import time
+
+from helpers import my_logger
+
+# HTTP status codes worth retrying: quota, timeouts and server side failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSPORT_ERRORS = {
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity per period seconds.
+    acquire blocks until the tokens are available and returns the time spent
+    waiting. A capacity of 0 or less disables the limit.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = capacity
+        self.rate = capacity / period if capacity > 0 else 0
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self, amount=1):
+        if self.capacity <= 0:
+            return 0.0
+        # A single request larger than the bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def charge(self, amount):
+        # Take tokens without waiting (may go negative), e.g. when a response
+        # used more tokens than estimated up front
+        if self.capacity <= 0 or amount <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_seconds, then lets one trial call through (half open): success
+    closes it again, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.reset_seconds - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Circuit open after {self._failures} consecutive "
+                        f"failures, retrying in {remaining:.0f}s"
+                    )
+                self.state = "half_open"
+            elif self.state == "half_open":
+                raise CircuitOpenError("Circuit half open, trial call in progress")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    my_logger.warning(
+                        f"Opening circuit after {self._failures} consecutive failures"
+                    )
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+def is_retryable(error):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # httpx transport errors subclass neither, so match them by name
+    return type(error).__name__ in TRANSPORT_ERRORS
+
+
+class ResilientClient:
+    """
+    Wraps a callable that makes one upstream request with requests and tokens
+    per minute limits, retries with jittered exponential backoff and a
+    circuit breaker.
+    :param requests_per_minute: request budget, 0 disables it.
+    :param tokens_per_minute: token budget, 0 disables it.
+    :param max_retries: retries after the first attempt for retryable errors.
+    :param backoff_base: first backoff in seconds, doubled on every retry.
+    :param backoff_max: upper bound of a single backoff.
+    :param failure_threshold: consecutive failures that open the circuit.
+    :param reset_seconds: how long the circuit stays open.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute,
+        tokens_per_minute,
+        max_retries,
+        backoff_base,
+        backoff_max,
+        failure_threshold,
+        reset_seconds,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {
+            "calls": 0,
+            "retries": 0,
+            "failures": 0,
+            "rejected": 0,
+            "throttled_seconds": 0.0,
+            "bytes_sent": 0,
+        }
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def backoff(self, attempt):
+        # Full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def call(self, request, estimated_tokens=0, used_tokens=None, payload_bytes=0):
+        """
+        Run request() within the limits, retrying retryable errors.
+        :param request: makes the upstream call and returns its response.
+        :param estimated_tokens: tokens taken from the budget before the call.
+        :param used_tokens: optional function returning the tokens a response
+            actually used, the difference to the estimate is charged after.
+        :param payload_bytes: size of the request body, counted in
+            stats["bytes_sent"] for every attempt.
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+
+            throttled = self.requests.acquire() + self.tokens.acquire(estimated_tokens)
+            if throttled:
+                self._count("throttled_seconds", throttled)
+
+            self._count("bytes_sent", payload_bytes)
+            try:
+                response = request()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The request itself was bad, the service is fine
+                    self.breaker.record_success()
+
+                if not retryable or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+
+                delay = self.backoff(attempt)
+                attempt += 1
+                self._count("retries")
+                my_logger.warning(
+                    f"Retrying request ({attempt}/{self.max_retries}) in "
+                    f"{delay:.1f}s after: {e}"
+                )
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            if used_tokens is not None:
+                try:
+                    self.tokens.charge((used_tokens(response) or 0) - estimated_tokens)
+                except Exception:
+                    pass
+            return response
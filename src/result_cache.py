@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import config
+from helpers import my_logger
+
+# Settings that change how files are processed but not what comes out of
+# the pipeline, so changing them keeps cached results valid
+_RUNTIME_ONLY_PREFIXES = ("CACHE_", "WARMUP", "READY_FILE")
+
+
+def config_fingerprint():
+    settings = {
+        name: value
+        for name, value in vars(config).items()
+        if name.isupper() and not name.startswith(_RUNTIME_ONLY_PREFIXES)
+    }
+    return hashlib.sha256(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+
+
+def file_key(input_file, pipeline_version):
+    # sha256 of the content, so renamed copies of a file share an entry
+    digest = hashlib.sha256()
+    input_file.seek(0)
+    for block in iter(lambda: input_file.read(1 << 20), b""):
+        digest.update(block)
+    input_file.seek(0)
+    return (
+        f"{digest.hexdigest()}:{input_file.type}:"
+        f"v{pipeline_version}:{config_fingerprint()}"
+    )
+
+
+def _connect():
+    directory = os.path.dirname(config.CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(config.CACHE_PATH, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        " key TEXT PRIMARY KEY,"
+        " value TEXT NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " created REAL NOT NULL,"
+        " last_access REAL NOT NULL)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)"
+    )
+    return connection
+
+
+def get(key):
+    try:
+        with closing(_connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            return json.loads(row[0])
+    except Exception as e:
+        my_logger.warning(f"Result cache lookup failed: {e}")
+        return None
+
+
+def put(key, result):
+    try:
+        value = json.dumps(result)
+        now = time.time()
+        with closing(_connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            _evict(connection)
+    except Exception as e:
+        my_logger.warning(f"Result cache store failed: {e}")
+
+
+def _evict(connection):
+    # Drop least recently used entries until the cache fits in CACHE_MAX_BYTES
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[
+        0
+    ]
+    if total <= config.CACHE_MAX_BYTES:
+        return
+
+    evicted = 0
+    for key, size in connection.execute(
+        "SELECT key, size FROM results ORDER BY last_access"
+    ).fetchall():
+        if total <= config.CACHE_MAX_BYTES:
+            break
+        connection.execute("DELETE FROM results WHERE key = ?", (key,))
+        total -= size
+        evicted += 1
+    my_logger.info(f"Result cache evicted {evicted} entries")
@@ -0,0 +1,30 @@
+"""
+Run the Streamlit app with the PII engines warming up from process start
+instead of from the first browser session. Extra arguments go to
+streamlit run.
+
+    python src/serve.py --server.port=8501
+"""
+
+import os
+import sys
+
+from streamlit.web import cli as stcli
+
+import config
+from warmup import start_warmup
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "better_ui.py")
+
+
+def main(argv=None):
+    if config.WARMUP:
+        # Streamlit runs the app script in this process, so the UI sees the
+        # same warm-up state and the engines it caches
+        start_warmup()
+    sys.argv = ["streamlit", "run", APP, *(sys.argv[1:] if argv is None else argv)]
+    return stcli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import numpy as np
+
+import config
+
+# Distinct counts are estimated from the KMV_SIZE smallest value hashes
+# (exact below that many distinct values)
+KMV_SIZE = 1024
+MAX_CELL_CHARS = 40
+
+
+def _short(value, limit=MAX_CELL_CHARS):
+    text = " ".join(str(value).split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def _number(value):
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.6g}"
+    return _short(value)
+
+
+class _ColumnStats:
+    def __init__(self):
+        self.dtypes = []
+        self.nulls = 0
+        self.counts = {}
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.low = self.high = None
+        self.total = 0.0
+        self.numeric = 0
+
+    def update(self, series, top_capacity):
+        import pandas as pd
+
+        dtype = str(series.dtype)
+        if dtype not in self.dtypes:
+            self.dtypes.append(dtype)
+
+        present = series.dropna()
+        self.nulls += len(series) - len(present)
+        if present.empty:
+            return
+
+        if pd.api.types.is_numeric_dtype(present) and not pd.api.types.is_bool_dtype(
+            present
+        ):
+            self._bounds(present.min(), present.max())
+            self.total += float(present.sum())
+            self.numeric += len(present)
+        elif pd.api.types.is_datetime64_any_dtype(present):
+            self._bounds(present.min(), present.max())
+
+        # Only the most frequent values of each chunk are merged, so counts
+        # past the first chunk are a lower bound for rarer values
+        top = present.value_counts(sort=True).head(top_capacity)
+        for value, count in top.items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > 2 * top_capacity:
+            kept = sorted(self.counts.items(), key=lambda item: -item[1])
+            self.counts = dict(kept[:top_capacity])
+
+        hashes = pd.util.hash_pandas_object(present, index=False).to_numpy()
+        self.hashes = np.unique(np.concatenate([self.hashes, hashes]))[:KMV_SIZE]
+
+    def _bounds(self, low, high):
+        try:
+            self.low = low if self.low is None else min(self.low, low)
+            self.high = high if self.high is None else max(self.high, high)
+        except TypeError:
+            # Chunks disagree on the type (numbers in one, dates in another)
+            pass
+
+    def distinct(self):
+        # k minimum values estimate: the k-th smallest of n uniform hashes
+        # sits near k / n of the hash range
+        if len(self.hashes) < KMV_SIZE:
+            return len(self.hashes), True
+        return int((KMV_SIZE - 1) * 2.0**64 / float(self.hashes[-1])), False
+
+
+class SheetSummary:
+    """
+    Fixed-size profile of an anonymized sheet for the analysis prompt, built
+    one chunk at a time with vectorized pandas operations: row count, and per
+    column the dtypes, null rate, distinct count, numeric or date range and
+    the most frequent values, plus the first few rows. Its size depends on
+    the number of columns only, never on the number of rows.
+    """
+
+    def __init__(self, top_k=None, max_columns=None, sample_rows=None):
+        self.top_k = top_k or config.SHEET_SUMMARY_TOP_K
+        self.max_columns = max_columns or config.SHEET_SUMMARY_MAX_COLUMNS
+        self.sample_rows = (
+            config.SHEET_SUMMARY_SAMPLE_ROWS if sample_rows is None else sample_rows
+        )
+        self.rows = 0
+        self.column_names = []
+        self.columns = {}
+        self.sample = None
+
+    def update(self, df):
+        import pandas as pd
+
+        self.rows += len(df)
+        for name in df.columns:
+            if name not in self.column_names:
+                self.column_names.append(name)
+                if len(self.columns) < self.max_columns:
+                    self.columns[name] = _ColumnStats()
+
+        for name, stats in self.columns.items():
+            if name in df.columns:
+                stats.update(df[name], top_capacity=self.top_k * 10)
+
+        if self.sample is None:
+            self.sample = df.head(self.sample_rows)
+        elif len(self.sample) < self.sample_rows:
+            self.sample = pd.concat([self.sample, df]).head(self.sample_rows)
+        return self
+
+    def _column_line(self, name, stats):
+        parts = ["/".join(stats.dtypes)]
+        parts.append(f"{stats.nulls / max(self.rows, 1):.0%} null")
+        distinct, exact = stats.distinct()
+        present = self.rows - stats.nulls
+        parts.append(f"{'' if exact else '~'}{distinct} distinct")
+        if stats.low is not None:
+            parts.append(f"range {_number(stats.low)} to {_number(stats.high)}")
+        if stats.numeric:
+            parts.append(f"mean {_number(stats.total / stats.numeric)}")
+        elif stats.low is None and stats.counts and distinct <= present / 2:
+            # Top values of a column of (nearly) unique values say nothing
+            top = sorted(stats.counts.items(), key=lambda item: -item[1])
+            parts.append(
+                "top "
+                + ", ".join(
+                    f'"{_short(value)}" x{count}' for value, count in top[: self.top_k]
+                )
+            )
+        return f"- {_short(name)}: " + ", ".join(parts)
+
+    def render(self):
+        import pandas as pd
+
+        lines = [f"{self.rows} rows, {len(self.column_names)} columns"]
+        for name, stats in self.columns.items():
+            lines.append(self._column_line(name, stats))
+        if len(self.column_names) > len(self.columns):
+            lines.append(f"- ... {len(self.column_names) - len(self.columns)} more")
+
+        if self.sample is not None and not self.sample.empty:
+            sample = self.sample.reindex(columns=list(self.columns))
+            lines.append(f"First {len(sample)} rows:")
+            lines.append(",".join(_short(name) for name in sample.columns))
+            for row in sample.itertuples(index=False):
+                lines.append(
+                    ",".join("" if pd.isna(value) else _short(value) for value in row)
+                )
+        return "\n".join(lines)
+
+
+def describe_sheets(sheets):
+    """
+    Prompt text for a DataFrame or {sheet_name: DataFrame or SheetSummary}:
+    each sheet's SheetSummary, or its first rows with SHEET_SUMMARY off.
+    """
+    sheets = sheets if isinstance(sheets, dict) else {None: sheets}
+    parts = []
+    for name, sheet in sheets.items():
+        if isinstance(sheet, SheetSummary):
+            text = sheet.render()
+        elif config.SHEET_SUMMARY:
+            text = SheetSummary().update(sheet).render()
+        else:
+            text = sheet.head().to_string()
+        parts.append((f"\nSheet {name}:\n" if name is not None else "") + text)
+    return "".join(parts)
@@ -0,0 +1,108 @@
+import re
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+_WHITESPACE = re.compile(r"\s")
+
+
+def _cut_point(text, start, end):
+    # Last line end in the second half of the window, else the last sentence
+    # end, else the last whitespace, else a hard cut at end
+    floor = start + (end - start) // 2
+    line_end = text.rfind("\n", floor, end)
+    if line_end != -1:
+        return line_end + 1
+    sentence_ends = [m.end() for m in _SENTENCE_END.finditer(text, floor, end)]
+    if sentence_ends:
+        return sentence_ends[-1]
+    spaces = [m.start() for m in _WHITESPACE.finditer(text, floor, end)]
+    if spaces:
+        return spaces[-1]
+    return end
+
+
+def split_text(text, max_chars, overlap):
+    """
+    Split text into chunks of at most max_chars on line, sentence or
+    whitespace boundaries, each starting at most overlap characters before
+    the end of the previous one (at a line start when there is one), so an
+    entity cut by one boundary is whole in a neighbour.
+    Returns (offset, chunk) pairs.
+    """
+    if len(text) <= max_chars:
+        return [(0, text)]
+
+    overlap = min(overlap, max_chars // 2)
+    chunks = []
+    start = 0
+    while True:
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            end = _cut_point(text, start, end)
+        chunks.append((start, text[start:end]))
+        if end >= len(text):
+            return chunks
+
+        next_start = max(end - overlap, start + 1)
+        # Start on a line, else on a word, not in the middle of one
+        line_start = text.find("\n", next_start - 1, end - 1)
+        if line_start != -1:
+            next_start = line_start + 1
+        elif not text[next_start - 1].isspace():
+            space = _WHITESPACE.search(text, next_start, end)
+            if space:
+                next_start = space.end()
+        start = next_start
+
+
+def combine_chunk_results(text, chunk_results):
+    """
+    Results for text from the results of its chunks, given as
+    (offset, length, results) in order: spans are shifted to text offsets
+    and merged with merge_spans.
+
+    Where a chunk edge falls inside a line, anchors (^, $, \\b) and context
+    see an artificial text edge, so a span touching that edge is dropped when
+    the neighbouring chunk, which overlaps the edge, covers the span away
+    from its own edges.
+    """
+    combined = []
+    for number, (offset, length, results) in enumerate(chunk_results):
+        end = offset + length
+        cut_start = offset > 0 and text[offset - 1] != "\n"
+        cut_end = end < len(text) and text[end - 1] != "\n" and text[end] != "\n"
+        previous_end = sum(chunk_results[number - 1][:2]) if number else 0
+        next_start = (
+            chunk_results[number + 1][0]
+            if number + 1 < len(chunk_results)
+            else len(text)
+        )
+        for result in results:
+            start, stop = result.start + offset, result.end + offset
+            if cut_start and start == offset and stop < previous_end:
+                continue
+            if cut_end and stop == end and start > next_start:
+                continue
+            result.start, result.end = start, stop
+            combined.append(result)
+    return merge_spans(combined)
+
+
+def merge_spans(results):
+    """
+    Merge results of overlapping chunks: spans of one entity type that
+    overlap (the same entity seen from two chunks, or cut short at one
+    chunk's edge) become one span with the highest score.
+    """
+    merged = []
+    for result in sorted(results, key=lambda r: (r.entity_type, r.start, -r.end)):
+        last = merged[-1] if merged else None
+        if (
+            last is not None
+            and last.entity_type == result.entity_type
+            and result.start < last.end
+        ):
+            last.end = max(last.end, result.end)
+            last.score = max(last.score, result.score)
+        else:
+            merged.append(result)
+    return sorted(merged, key=lambda r: (r.start, r.end))
@@ -0,0 +1,72 @@
+import importlib
+import os
+import threading
+import time
+
+import config
+from helpers import my_logger
+
+# Modules loaded after the engines so the first file of any format does not
+# pay their import cost either
+FORMAT_MODULES = ["pandas", "openpyxl", "pptx", "PyPDF2", "PIL.Image", "google.genai"]
+
+_state = {"status": "idle", "error": None, "seconds": None}
+_state_lock = threading.Lock()
+
+
+def readiness():
+    with _state_lock:
+        return dict(_state)
+
+
+def is_ready():
+    return readiness()["status"] == "ready"
+
+
+def _set_state(**changes):
+    with _state_lock:
+        _state.update(changes)
+
+
+def _warm_up():
+    start = time.perf_counter()
+    try:
+        from pii_remover import (
+            analyzer_engine,
+            anonymizer_engine,
+            image_redactor_engine,
+        )
+
+        # One analyze call also loads the lazily initialised recognizers
+        analyzer_engine().analyze(text="Warm up John Smith", language="en")
+        anonymizer_engine()
+        image_redactor_engine()
+
+        for module in FORMAT_MODULES:
+            importlib.import_module(module)
+    except Exception as e:
+        my_logger.error(f"Engine warm-up failed: {e}")
+        _set_state(status="failed", error=str(e), seconds=time.perf_counter() - start)
+        return
+
+    seconds = time.perf_counter() - start
+    _set_state(status="ready", seconds=seconds)
+    my_logger.info(f"Engines warmed up in {seconds:.1f}s")
+
+    if config.READY_FILE:
+        with open(config.READY_FILE, "w") as f:
+            f.write(f"{seconds:.1f}\n")
+
+
+def start_warmup():
+    # Safe to call on every Streamlit rerun, the thread is only started once
+    # per process
+    with _state_lock:
+        if _state["status"] != "idle":
+            return
+        _state["status"] = "warming"
+
+    if config.READY_FILE and os.path.exists(config.READY_FILE):
+        os.remove(config.READY_FILE)
+
+    threading.Thread(target=_warm_up, name="engine-warmup", daemon=True).start()
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+from presidio_analyzer import Pattern, PatternRecognizer
+
+from combined_pattern_recognizer import (
+    CombinedPatternRecognizer,
+    load_pattern_recognizers,
+)
+
+PATTERNS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "src", "patterns"
+)
+
+
+def _recognizer(entity, regex, score=0.5):
+    return PatternRecognizer(
+        supported_entity=entity, patterns=[Pattern(entity, regex, score)]
+    )
+
+
+def _spans(results):
+    return sorted((r.entity_type, r.start, r.end, r.score) for r in results)
+
+
+def _separate(recognizers, text):
+    return [
+        result
+        for recognizer in recognizers
+        for result in recognizer.analyze(text, entities=[])
+    ]
+
+
+def _combined(recognizers, text):
+    return CombinedPatternRecognizer(recognizers).analyze(text, entities=[])
+
+
+@pytest.mark.parametrize(
+    "patterns, text",
+    [
+        # A lower scoring pattern matching a longer span at a later offset
+        ([("C", "foo abc", 0.9), ("D", "abc foocd", 0.4)], "foo abc foocd"),
+        # Two patterns matching at the same offset
+        ([("A", r"\d{3}", 0.6), ("B", r"\d{3}-\d{4}", 0.5)], "call 555-1234 now"),
+        # One pattern matching inside another's match
+        ([("A", r"id-\d+-x", 0.5), ("B", r"\d+", 0.3)], "id-42-x and 7"),
+        ([("A", r"^ab", 0.5), ("B", r"b\w+", 0.5)], "abc\nabd abe"),
+    ],
+)
+def test_combined_matches_separate_recognizers(patterns, text):
+    recognizers = [_recognizer(*pattern) for pattern in patterns]
+    assert _spans(_combined(recognizers, text)) == _spans(_separate(recognizers, text))
+
+
+def test_combined_matches_separate_for_custom_patterns():
+    recognizers = load_pattern_recognizers(PATTERNS_DIR)
+    text = "EMP12345 joined\nHT-12345-AL\nowner EMP99999\nEMP00001 and HT-54321-AL"
+    assert _spans(_combined(recognizers, text)) == _spans(_separate(recognizers, text))
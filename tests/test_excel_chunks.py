@@ -0,0 +1,63 @@
+import io
+import re
+import zipfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+from helpers import iter_excel_chunks
+
+
+def _without_dimension(data):
+    # Rewrites a workbook without the <dimension> element of its sheets, as
+    # some exporters write them
+    source = zipfile.ZipFile(io.BytesIO(data))
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as target:
+        for item in source.infolist():
+            content = source.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                content = re.sub(rb"<dimension[^>]*/>", b"", content)
+            target.writestr(item, content)
+    return out.getvalue()
+
+
+def _ragged_workbook():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Assets"
+    sheet.append(["host", "owner", "email"])
+    sheet.append(["web-01"])
+    sheet.append(["db-01", "Alice Smith", "alice@example.com", "extra note"])
+    sheet.append([None, None])
+    sheet.append(["app-01", "Bob Jones"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return _without_dimension(buffer.getvalue())
+
+
+def _chunks(data, chunk_rows):
+    return [df for _, df in iter_excel_chunks(io.BytesIO(data), chunk_rows)]
+
+
+def test_dimensionless_ragged_sheet_matches_read_excel():
+    data = _ragged_workbook()
+    # Empty rows are skipped by iter_excel_chunks
+    expected = pd.read_excel(io.BytesIO(data)).dropna(how="all")
+
+    (df,) = _chunks(data, 100)
+
+    assert list(df.columns) == list(expected.columns)
+    assert df.astype(object).where(df.notna(), None).values.tolist() == (
+        expected.astype(object).where(expected.notna(), None).values.tolist()
+    )
+
+
+def test_cells_right_of_the_header_are_kept_across_chunks():
+    data = _ragged_workbook()
+
+    chunks = _chunks(data, 1)
+
+    assert [len(df) for df in chunks] == [1, 1, 1]
+    assert chunks[1].loc[0, "Unnamed: 3"] == "extra note"
+    assert list(chunks[2].columns) == ["host", "owner", "email", "Unnamed: 3"]
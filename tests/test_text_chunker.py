@@ -0,0 +1,67 @@
+import os
+import random
+
+import pytest
+from presidio_analyzer.predefined_recognizers import EmailRecognizer
+
+import config
+import pii_remover
+from combined_pattern_recognizer import load_pattern_recognizers
+from text_chunker import merge_spans
+
+PATTERNS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "src", "patterns"
+)
+RECOGNIZERS = load_pattern_recognizers(PATTERNS_DIR) + [EmailRecognizer()]
+
+
+def _pattern_analysis(values, *args, **kwargs):
+    # The custom YAML patterns (anchored with ^ and $) and an email pattern,
+    # in place of the full analyzer
+    return [
+        [
+            result
+            for recognizer in RECOGNIZERS
+            for result in recognizer.analyze(value, entities=[])
+        ]
+        for value in values
+    ]
+
+
+def _document(lines=400, seed=0):
+    rng = random.Random(seed)
+    words = "the firewall rule allows tcp from dmz to core switch owner".split()
+    parts = [
+        "EMP12345 joined the team",
+        "badge EMPXYZ99 stays mid line",
+        "HT-12345-AL",
+        "token HT-54321-AL is not alone on its line",
+        "mail admin@example.com for access",
+    ]
+    text = []
+    for _ in range(lines):
+        line = rng.choices(words, k=rng.randrange(3, 15))
+        if rng.random() < 0.3:
+            line.insert(rng.randrange(len(line) + 1), rng.choice(parts))
+        text.append(" ".join(line))
+    return "\n".join(text)
+
+
+def _spans(results):
+    return [(r.entity_type, r.start, r.end, r.score) for r in merge_spans(results)]
+
+
+@pytest.mark.parametrize("max_chars", [97, 150, 333, 1000])
+@pytest.mark.parametrize("overlap", [20, 60, 200])
+def test_chunked_analysis_matches_unchunked(monkeypatch, max_chars, overlap):
+    monkeypatch.setattr(pii_remover, "_analyze_values", _pattern_analysis)
+    text = _document()
+
+    monkeypatch.setattr(config, "TEXT_CHUNK_CHARS", len(text) + 1)
+    (unchunked,) = pii_remover._analyze_texts([text])
+
+    monkeypatch.setattr(config, "TEXT_CHUNK_CHARS", max_chars)
+    monkeypatch.setattr(config, "TEXT_CHUNK_OVERLAP", overlap)
+    (chunked,) = pii_remover._analyze_texts([text])
+
+    assert _spans(chunked) == _spans(unchunked)